@@ -20,26 +20,33 @@ import sys
 import os
 from datetime import datetime, timezone
 
+try:
+    import uvloop  # Optional: faster libuv-based event loop (not available on Windows)
+except ImportError:
+    uvloop = None
+
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.config import config
-from src.hyperliquid_api import get_current_prices
+from src.logger import setup_logger, stop_loggers
+from src.hyperliquid_api import HyperliquidAPI, get_current_prices
 from src.wallet_discovery import WalletDiscovery
 from src.position_scanner import PositionScanner
 from src.liquidation_aggregator import LiquidationAggregator
 from src.historical_storage import HistoricalStorage
 
 
-async def run_collection_cycle(storage: HistoricalStorage, verbose: bool = True):
-    """Run a single data collection cycle"""
+async def run_collection_cycle(storage: HistoricalStorage, discovery: WalletDiscovery = None, verbose: bool = True) -> dict:
+    """Run a single data collection cycle, returning the liquidation maps it stored"""
     timestamp = datetime.now(timezone.utc)
     
     if verbose:
         print(f"\n[{timestamp.strftime('%Y-%m-%d %H:%M:%S')}] Starting collection cycle...")
     
-    # Load wallets
-    discovery = WalletDiscovery()
-    discovery.load_from_file()
+    # Load wallets (a long-lived discovery only re-reads the file when it changed)
+    if discovery is None:
+        discovery = WalletDiscovery()
+    discovery.reload_if_changed()
     
     # Get fresh wallets (seen in last 24h)
     wallets = discovery.get_wallets(max_age_hours=24)
@@ -49,18 +56,18 @@ async def run_collection_cycle(storage: HistoricalStorage, verbose: bool = True)
         if verbose:
             print(f"  Only {len(wallets)} fresh wallets, refreshing...")
         await discovery.backfill_from_recent_trades(config.ASSETS[:15])
-        discovery.save_to_file()
+        await asyncio.to_thread(discovery.save_to_file)
         wallets = discovery.get_wallets(max_age_hours=24)
     
     if verbose:
         print(f"  Scanning {len(wallets)} wallets...")
     
-    # Scan positions
+    # Scan positions and fetch prices concurrently (independent requests)
     async with PositionScanner() as scanner:
-        scan_result = await scanner.scan_wallets(wallets)
-    
-    # Get prices
-    prices = await get_current_prices()
+        scan_result, prices = await asyncio.gather(
+            scanner.scan_wallets(wallets),
+            get_current_prices(scanner.api),
+        )
     
     # Build liquidation maps
     aggregator = LiquidationAggregator()
@@ -71,12 +78,15 @@ async def run_collection_cycle(storage: HistoricalStorage, verbose: bool = True)
     for coin, liq_map in liq_maps.items():
         liq_maps_dict[coin] = liq_map.to_dict()
     
-    # Store snapshot
-    storage.store_snapshot(liq_maps_dict, timestamp)
-    storage.store_prices(prices, timestamp)
-    
-    # Save current state to JSON files too
-    aggregator.save_maps()
+    # Store snapshot, prices and the latest map (served by the dashboard) in one transaction.
+    # Off the event loop, so an embedding API server keeps answering meanwhile.
+    store = asyncio.ensure_future(asyncio.to_thread(storage.store_cycle, liq_maps_dict, prices, timestamp))
+    try:
+        await asyncio.shield(store)
+    except asyncio.CancelledError:
+        # The worker thread can't be interrupted; let it finish before the caller closes storage
+        await store
+        raise
     
     if verbose:
         stats = storage.get_stats()
@@ -84,40 +94,70 @@ async def run_collection_cycle(storage: HistoricalStorage, verbose: bool = True)
         print(f"  Total snapshots in DB: {stats['snapshot_count']}")
         print(f"  DB size: {stats['db_size_mb']:.2f} MB")
     
-    return len(liq_maps)
+    return liq_maps_dict
 
 
-async def run_continuous(interval_seconds: int = 300, verbose: bool = True):
-    """Run continuous data collection"""
-    storage = HistoricalStorage()
-    
-    print(f"Starting continuous data collection (interval: {interval_seconds}s)")
-    print("Press Ctrl+C to stop\n")
-    
+async def run_on_schedule(cycle, interval_seconds: float, verbose: bool = True, error_delay: float = 30):
+    """
+    Await cycle() forever against fixed deadlines, so cycle duration doesn't
+    add to the interval. Errors are printed and retried after error_delay.
+    """
     cycle_count = 0
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
     
     while True:
         try:
             cycle_count += 1
-            coins_collected = await run_collection_cycle(storage, verbose)
+            await cycle()
             
-            if verbose:
-                print(f"  Cycle #{cycle_count} complete. Next in {interval_seconds}s...")
+            next_tick += interval_seconds
+            sleep_for = next_tick - loop.time()
             
-            await asyncio.sleep(interval_seconds)
+            if sleep_for > 0:
+                if verbose:
+                    print(f"  Cycle #{cycle_count} complete. Next in {sleep_for:.0f}s...")
+                await asyncio.sleep(sleep_for)
+            else:
+                # Overran the interval: start now and re-anchor instead of bursting to catch up
+                print(f"  Cycle #{cycle_count} overran the interval by {-sleep_for:.0f}s, starting next cycle now")
+                next_tick = loop.time()
             
-        except KeyboardInterrupt:
-            print("\nStopping collector...")
-            break
         except Exception as e:
             print(f"  Error: {e}")
-            await asyncio.sleep(30)  # Wait 30s on error
+            await asyncio.sleep(error_delay)
+            next_tick = loop.time()
+
+
+async def run_continuous(interval_seconds: int = 300, verbose: bool = True, flush_every: int = None):
+    """Run continuous data collection"""
+    storage = HistoricalStorage(flush_every=flush_every)
+    discovery = WalletDiscovery()
+    
+    print(f"Starting continuous data collection (interval: {interval_seconds}s)")
+    print("Press Ctrl+C to stop\n")
+    
+    try:
+        await run_on_schedule(
+            lambda: run_collection_cycle(storage, discovery, verbose),
+            interval_seconds,
+            verbose,
+        )
+    except KeyboardInterrupt:
+        print("\nStopping collector...")
+    finally:
+        # Ctrl+C usually arrives as task cancellation; write any batched cycles first
+        storage.flush(force=True)
+        await HyperliquidAPI.aclose_shared()
 
 
 async def run_once(verbose: bool = True):
     """Run a single collection and store to database"""
     storage = HistoricalStorage()
-    await run_collection_cycle(storage, verbose)
+    try:
+        await run_collection_cycle(storage, verbose=verbose)
+    finally:
+        await HyperliquidAPI.aclose_shared()
     
     stats = storage.get_stats()
     print(f"\nDatabase stats:")
@@ -132,14 +172,22 @@ def main():
     parser.add_argument("--continuous", action="store_true", help="Run continuously")
     parser.add_argument("--interval", type=int, default=900, help="Collection interval in seconds (default: 900 = 15 min)")
     parser.add_argument("--quiet", action="store_true", help="Minimal output")
+    parser.add_argument("--flush-every", type=int, default=None,
+                        help="Write to the database every N cycles (default: config.STORAGE_FLUSH_EVERY_CYCLES)")
     
     args = parser.parse_args()
     verbose = not args.quiet
+    setup_logger()
+    
+    run = uvloop.run if uvloop else asyncio.run
     
-    if args.continuous:
-        asyncio.run(run_continuous(args.interval, verbose))
-    else:
-        asyncio.run(run_once(verbose))
+    try:
+        if args.continuous:
+            run(run_continuous(args.interval, verbose, args.flush_every))
+        else:
+            run(run_once(verbose))
+    finally:
+        stop_loggers()
 
 
 if __name__ == "__main__":
@@ -10,30 +10,87 @@ Provides:
 Usage:
     python dashboard.py
     # API available at http://localhost:8001
+
+Set config.EMBEDDED_COLLECTOR to run collection cycles inside this process
+instead of a separate collector.py.
 """
 import asyncio
-import json
+import hashlib
 import os
 import sys
+import time
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+import orjson
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.config import config
-from src.hyperliquid_api import get_current_prices
+from src.logger import setup_logger, stop_loggers
+from src.hyperliquid_api import HyperliquidAPI, get_current_prices
 from src.market_data import get_market_data
-from src.apex_client import ApexClient, collect_apex_data
+from src.apex_client import ApexClient
+from src.combined_merge import build_combined, build_funding
+from src.historical_storage import HistoricalStorage
+from src.wallet_discovery import WalletDiscovery
+from collector import run_collection_cycle, run_on_schedule
+
+
+# Long-lived Apex client so requests reuse one connection pool
+_apex_client: Optional[ApexClient] = None
+
+# Storage the collector writes the latest liquidation map into
+_storage: Optional[HistoricalStorage] = None
+
+# In-process collection loop (only when config.EMBEDDED_COLLECTOR is set)
+_collector_task: Optional[asyncio.Task] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and close them on shutdown"""
+    global _apex_client, _storage, _collector_task
+    
+    setup_logger()
+    _storage = HistoricalStorage()
+    _apex_client = await ApexClient().__aenter__()
+    if config.EMBEDDED_COLLECTOR:
+        # Serve the last stored map until the first in-process cycle completes
+        await _refresh_liquidations()
+        _collector_task = asyncio.create_task(_background_collector_loop())
+    try:
+        yield
+    finally:
+        if _collector_task is not None:
+            # Wait for the cancelled cycle to unwind (including an in-flight
+            # store_cycle thread) before flushing and closing storage
+            _collector_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await _collector_task
+            _collector_task = None
+            _storage.flush(force=True)
+        for task in _retry_tasks.values():
+            task.cancel()
+        await _apex_client.__aexit__(None, None, None)
+        await ApexClient.aclose_shared()
+        await HyperliquidAPI.aclose_shared()
+        _apex_client = None
+        _storage.close()
+        stop_loggers()
+
 
 app = FastAPI(
     title="Hyperliquid Data Collector",
-    description="Collects and serves liquidation & market data from Hyperliquid"
+    description="Collects and serves liquidation & market data from Hyperliquid",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Enable CORS for trading bot access
@@ -45,44 +102,228 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Cache
-_market_data_cache = {}
-_cache_lock = asyncio.Lock()
-_market_data_timestamp = None
+def _etag(raw: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(raw, digest_size=8).hexdigest() + '"'
 
 
-def load_json_file(filepath: str) -> dict:
-    """Load JSON file safely"""
+# Cache
+_market_data_cache = {}
+_market_data_raw = b"{}"  # serialized once per refresh, served as-is
+_market_data_etag = _etag(_market_data_raw)
+_market_data_generation = 0  # bumped whenever new data is swapped in
+_market_data_totals = {"total_oi": 0, "total_volume": 0}
+_market_data_timestamp = None  # last refresh attempt, drives the TTL
+_market_data_last_ok = None  # last successful refresh, drives X-Data-Age-Seconds
+_refresh_task: Optional[asyncio.Task] = None
+_refresh_lock = asyncio.Lock()
+MARKET_DATA_CACHE_TTL = 30  # seconds
+
+# Background retries after a failed refresh (exponential backoff)
+RETRY_INITIAL_DELAY = 2  # seconds
+RETRY_MAX_DELAY = 60  # seconds
+_retry_tasks: Dict[str, asyncio.Task] = {}
+_retry_delays: Dict[str, float] = {}
+
+# Liquidation map (parsed + raw bytes + totals), invalidated when the collector writes a new one
+_liq_cache = {"updated_at": 0, "data": {}, "raw": b"{}", "etag": _etag(b"{}"), "totals": {"total_long": 0, "total_short": 0}}
+_liq_cache_lock = asyncio.Lock()
+
+
+def _json_response(request: Request, raw: bytes, etag: str, headers: Dict[str, str] = None) -> Response:
+    """Serve pre-serialized JSON, or 304 Not Modified if the client already has this version"""
+    headers = {"ETag": etag, "Cache-Control": "max-age=30", **(headers or {})}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    return Response(content=raw, media_type="application/json", headers=headers)
+
+
+def load_json_file(filepath: str) -> Tuple[bytes, dict]:
+    """Load JSON file safely, returning both the raw bytes and the parsed dict"""
     try:
-        with open(filepath, "r") as f:
-            return json.load(f)
+        with open(filepath, "rb") as f:
+            raw = f.read()
+        return raw, orjson.loads(raw)
     except FileNotFoundError:
+        return b"{}", {}
+    except orjson.JSONDecodeError:
+        return b"{}", {}
+
+
+def _set_liq_cache(updated_at: float, raw: bytes, data: dict):
+    """Swap a freshly loaded liquidation map into the cache"""
+    totals = {
+        "total_long": sum(m.get("total_long_at_risk_usd", 0) or 0 for m in data.values()),
+        "total_short": sum(m.get("total_short_at_risk_usd", 0) or 0 for m in data.values()),
+    }
+    _liq_cache.update(updated_at=updated_at, data=data, raw=raw, etag=_etag(raw), totals=totals)
+
+
+def _load_latest_maps() -> Optional[Tuple[float, bytes, dict]]:
+    """Read and parse the latest liquidation map row from SQLite"""
+    latest = _storage.get_latest_maps_raw()
+    if latest is None:
+        return None
+    updated_at, raw = latest
+    return updated_at, raw, orjson.loads(raw)
+
+
+async def _refresh_liquidations():
+    """Reload the liquidation map if the collector stored a newer one"""
+    async with _liq_cache_lock:
+        if _storage is not None:
+            updated_at = await asyncio.to_thread(_storage.get_latest_updated_at)
+            if updated_at is not None:
+                if updated_at != _liq_cache["updated_at"]:
+                    # Parsing a large map blocks for tens of ms, keep it off the event loop
+                    latest = await asyncio.to_thread(_load_latest_maps)
+                    if latest is not None:
+                        _set_liq_cache(*latest)
+                return
+
+        # Nothing in SQLite yet: fall back to the JSON file written by older collectors
+        filepath = config.LIQUIDATION_MAP_FILE
+        try:
+            mtime = (await asyncio.to_thread(os.stat, filepath)).st_mtime
+        except FileNotFoundError:
+            _set_liq_cache(0, b"{}", {})
+            return
+
+        if mtime != _liq_cache["updated_at"]:
+            raw, data = await asyncio.to_thread(load_json_file, filepath)
+            _set_liq_cache(mtime, raw, data)
+
+
+async def get_cached_liquidations() -> Dict:
+    """Get liquidation maps, re-parsing only when the collector stored a new one"""
+    if _collector_task is None:
+        await _refresh_liquidations()
+    return _liq_cache["data"]
+
+
+async def get_cached_liquidations_raw() -> bytes:
+    """Get the latest liquidation map as JSON bytes, suitable for serving as-is"""
+    if _collector_task is None:
+        await _refresh_liquidations()
+    return _liq_cache["raw"]
+
+
+async def _background_collector_loop():
+    """
+    Run collection cycles in-process and publish each result straight
+    into the liquidation cache, so requests never touch disk.
+
+    Cycles still go through store_cycle, which keeps history and the
+    latest map in SQLite for restarts.
+    """
+    discovery = WalletDiscovery()
+
+    async def cycle():
+        liq_maps = await run_collection_cycle(_storage, discovery, verbose=False)
+        raw = orjson.dumps(liq_maps)
+        async with _liq_cache_lock:
+            _set_liq_cache(time.time(), raw, liq_maps)
+
+    await run_on_schedule(cycle, config.EMBEDDED_COLLECTOR_INTERVAL_SECONDS, verbose=False)
+
+
+def _schedule_retry(name: str, refresh):
+    """
+    Re-run a failed cache refresh in the background with exponential backoff.
+
+    At most one retry is pending per cache; the delay resets via
+    _reset_retry() once a refresh succeeds.
+    """
+    pending = _retry_tasks.get(name)
+    if pending is not None and not pending.done():
+        return
+
+    delay = _retry_delays.get(name, RETRY_INITIAL_DELAY)
+    _retry_delays[name] = min(delay * 2, RETRY_MAX_DELAY)
+
+    async def _retry_later():
+        await asyncio.sleep(delay)
+        _retry_tasks.pop(name, None)
+        await refresh()
+
+    _retry_tasks[name] = asyncio.create_task(_retry_later())
+
+
+def _reset_retry(name: str):
+    """Forget the backoff state for a cache after a successful refresh"""
+    _retry_delays.pop(name, None)
+
+
+def _age_headers(last_ok: Optional[datetime]) -> Dict[str, str]:
+    """Build the X-Data-Age-Seconds header for data last refreshed at last_ok"""
+    if last_ok is None:
         return {}
-    except json.JSONDecodeError:
-        return {}
+    age = (datetime.now(timezone.utc) - last_ok).total_seconds()
+    return {"X-Data-Age-Seconds": str(int(age))}
+
+
+async def _refresh_market_data():
+    """
+    Fetch market data and swap it into the cache.
+
+    On failure the last-known-good data keeps being served and a
+    background retry is scheduled.
+    """
+    global _market_data_cache, _market_data_raw, _market_data_etag, _market_data_totals, _market_data_generation
+    global _market_data_timestamp, _market_data_last_ok, _refresh_task
+
+    try:
+        # Plain dicts: the cache is only ever serialized
+        data = await get_market_data(include_liquidity=True, raw_dicts=True)
+        if not data:
+            raise ValueError("empty response")
+        _market_data_cache = data
+        _market_data_raw = orjson.dumps(_market_data_cache)
+        _market_data_etag = _etag(_market_data_raw)
+        _market_data_generation += 1
+        _market_data_totals = {
+            "total_oi": sum(d["open_interest_usd"] for d in data.values()),
+            "total_volume": sum(d["volume_24h_usd"] for d in data.values()),
+        }
+        _market_data_last_ok = datetime.now(timezone.utc)
+        _reset_retry("market_data")
+    except Exception as e:
+        print(f"Error fetching market data: {e}")
+        _schedule_retry("market_data", _force_refresh_market_data)
+    finally:
+        _market_data_timestamp = datetime.now(timezone.utc)
+        _refresh_task = None
+
+
+async def _force_refresh_market_data():
+    """Refresh market data regardless of the TTL, sharing any in-flight refresh"""
+    global _refresh_task
+
+    async with _refresh_lock:
+        if _refresh_task is None or _refresh_task.done():
+            _refresh_task = asyncio.create_task(_refresh_market_data())
+        task = _refresh_task
+
+    await asyncio.shield(task)
 
 
 async def get_cached_market_data() -> Dict:
-    """Get market data with caching (refresh every 30s) - with lock to prevent race conditions"""
-    global _market_data_cache, _market_data_timestamp
+    """
+    Get market data with caching (refresh every 30s).
 
-    async with _cache_lock:
-        now = datetime.now(timezone.utc)
-        if _market_data_timestamp is None or (now - _market_data_timestamp).seconds > 30:
-            try:
-                data = await get_market_data(include_liquidity=True)
-                _market_data_cache = {coin: d.to_dict() for coin, d in data.items()}
-                _market_data_timestamp = now
-            except Exception as e:
-                print(f"Error fetching market data: {e}")
+    Concurrent callers that find the cache stale share a single in-flight
+    refresh instead of queueing behind a lock held across the fetch.
+    """
+    now = datetime.now(timezone.utc)
+    if _market_data_timestamp is not None and (now - _market_data_timestamp).total_seconds() < MARKET_DATA_CACHE_TTL:
+        return _market_data_cache
 
+    await _force_refresh_market_data()
     return _market_data_cache
 
 
-@app.get("/", response_class=HTMLResponse)
-async def dashboard():
-    """Data Collector Dashboard"""
-    return """
+_DASHBOARD_HTML = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -194,17 +435,19 @@ async def dashboard():
 </div>
 
 <script>
-    let data = { maps: {}, market: {} };
+    let data = { maps: {}, market: {}, summary: {} };
     
     async function fetchData() {
         try {
-            const [liqResponse, marketResponse] = await Promise.all([
+            const [liqResponse, marketResponse, summaryResponse] = await Promise.all([
                 fetch('api/liquidations'),
-                fetch('api/market-data')
+                fetch('api/market-data'),
+                fetch('api/summary')
             ]);
             
             data.maps = await liqResponse.json();
             data.market = await marketResponse.json();
+            data.summary = await summaryResponse.json();
             
             updateUI();
         } catch (e) {
@@ -228,24 +471,13 @@ async def dashboard():
     function updateUI() {
         const maps = data.maps || {};
         const market = data.market || {};
+        const summary = data.summary || {};
         
-        let totalLong = 0, totalShort = 0, totalOI = 0, totalVolume = 0;
-        
-        Object.values(maps).forEach(m => {
-            totalLong += m.total_long_at_risk_usd || 0;
-            totalShort += m.total_short_at_risk_usd || 0;
-        });
-        
-        Object.values(market).forEach(m => {
-            totalOI += m.open_interest_usd || 0;
-            totalVolume += m.volume_24h_usd || 0;
-        });
-        
-        document.getElementById('total-long').textContent = formatUSD(totalLong);
-        document.getElementById('total-short').textContent = formatUSD(totalShort);
-        document.getElementById('total-oi').textContent = formatUSD(totalOI);
-        document.getElementById('total-volume').textContent = formatUSD(totalVolume);
-        document.getElementById('total-assets').textContent = Object.keys(maps).length;
+        document.getElementById('total-long').textContent = formatUSD(summary.total_long || 0);
+        document.getElementById('total-short').textContent = formatUSD(summary.total_short || 0);
+        document.getElementById('total-oi').textContent = formatUSD(summary.total_oi || 0);
+        document.getElementById('total-volume').textContent = formatUSD(summary.total_volume || 0);
+        document.getElementById('total-assets').textContent = summary.asset_count || 0;
         document.getElementById('last-update').textContent = new Date().toLocaleTimeString();
         
         // Update coin selector
@@ -446,21 +678,52 @@ async def dashboard():
 </script>
 </body>
 </html>
-    """
+"""
+
+# Encoded once at import; the page is static and only its data is fetched live
+_DASHBOARD_BYTES = _DASHBOARD_HTML.encode("utf-8")
+
+
+@app.get("/", response_class=HTMLResponse)
+async def dashboard():
+    """Data Collector Dashboard"""
+    return Response(
+        content=_DASHBOARD_BYTES,
+        media_type="text/html; charset=utf-8",
+        headers={"Cache-Control": "public, max-age=300"},
+    )
 
 
 # ============== API ENDPOINTS ==============
 
 @app.get("/api/liquidations")
-async def get_liquidations():
+async def get_liquidations(request: Request):
     """Get all liquidation maps"""
-    return load_json_file(config.LIQUIDATION_MAP_FILE)
+    # Serve the stored bytes directly, no decode/re-encode round trip
+    raw = await get_cached_liquidations_raw()
+    return _json_response(request, raw, _liq_cache["etag"])
 
 
 @app.get("/api/market-data")
-async def get_market_data_endpoint():
+async def get_market_data_endpoint(request: Request):
     """Get market data for all assets (OI, volume, funding, liquidity)"""
-    return await get_cached_market_data()
+    await get_cached_market_data()
+    return _json_response(request, _market_data_raw, _market_data_etag, _age_headers(_market_data_last_ok))
+
+
+@app.get("/api/summary")
+async def get_summary():
+    """Get dashboard totals (liquidations at risk, OI, volume) precomputed on cache refresh"""
+    liq_data, _ = await asyncio.gather(
+        get_cached_liquidations(),
+        get_cached_market_data(),
+    )
+    
+    return {
+        **_liq_cache["totals"],
+        **_market_data_totals,
+        "asset_count": len(liq_data),
+    }
 
 
 @app.get("/api/asset/{coin}")
@@ -468,8 +731,10 @@ async def get_asset_data(coin: str):
     """Get complete data for a single asset"""
     coin = coin.upper()
     
-    liq_data = load_json_file(config.LIQUIDATION_MAP_FILE)
-    market_data = await get_cached_market_data()
+    liq_data, market_data = await asyncio.gather(
+        get_cached_liquidations(),
+        get_cached_market_data(),
+    )
     
     if coin not in liq_data and coin not in market_data:
         raise HTTPException(status_code=404, detail=f"No data for {coin}")
@@ -493,18 +758,16 @@ async def health_check():
     """
     Detailed health check with data freshness monitoring
     """
-    import os
-    
     try:
-        liq_file = config.LIQUIDATION_MAP_FILE
-        liq_data = load_json_file(liq_file)
+        liq_data = await get_cached_liquidations()
         
         liq_file_age = float('inf')
         liq_last_update = None
         
-        if os.path.exists(liq_file):
+        # The cache already knows when the map was last written
+        if _liq_cache["updated_at"]:
             liq_last_update = datetime.fromtimestamp(
-                os.path.getmtime(liq_file),
+                _liq_cache["updated_at"],
                 tz=timezone.utc
             )
             liq_file_age = (datetime.now(timezone.utc) - liq_last_update).total_seconds()
@@ -536,28 +799,43 @@ async def health_check():
 
 # Cache for Apex data
 _apex_cache: Dict = {}
-_apex_cache_time: Optional[datetime] = None
+_apex_cache_time: Optional[datetime] = None  # last refresh attempt
+_apex_last_ok: Optional[datetime] = None  # last successful refresh
+_apex_by_coin: Dict = {}  # same data keyed by base coin (BTCUSDT -> BTC), rebuilt per refresh
+_apex_generation = 0  # bumped whenever new data is swapped in
 _apex_cache_lock = asyncio.Lock()
 APEX_CACHE_TTL = 60  # seconds
 
 
-async def get_cached_apex_data() -> Dict:
-    """Get Apex market data with caching"""
-    global _apex_cache, _apex_cache_time
+async def get_cached_apex_data(force: bool = False) -> Dict:
+    """
+    Get Apex market data with caching.
+
+    A failed refresh keeps serving the last-known-good data and
+    schedules a background retry.
+    """
+    global _apex_cache, _apex_cache_time, _apex_last_ok, _apex_by_coin, _apex_generation
     
     async with _apex_cache_lock:
         now = datetime.now(timezone.utc)
         
-        if _apex_cache_time and (now - _apex_cache_time).total_seconds() < APEX_CACHE_TTL:
+        if not force and _apex_cache_time and (now - _apex_cache_time).total_seconds() < APEX_CACHE_TTL:
             return _apex_cache
         
+        _apex_cache_time = now
         try:
-            _apex_cache = await collect_apex_data()
-            _apex_cache_time = now
-            return _apex_cache
+            data = await _apex_client.get_all_market_data()
+            if not data:
+                raise ValueError("empty response")
+            _apex_cache = data
+            _apex_by_coin = {symbol.removesuffix("USDT"): d for symbol, d in data.items()}
+            _apex_generation += 1
+            _apex_last_ok = now
+            _reset_retry("apex")
         except Exception as e:
             print(f"Error fetching Apex data: {e}")
-            return _apex_cache or {}
+            _schedule_retry("apex", lambda: get_cached_apex_data(force=True))
+        return _apex_cache
 
 
 @app.get("/api/apex/market-data")
@@ -568,7 +846,8 @@ async def get_apex_market_data():
     Returns ticker and orderbook data for top symbols.
     Note: Apex doesn't expose individual positions, so no liquidation data.
     """
-    return await get_cached_apex_data()
+    data = await get_cached_apex_data()
+    return ORJSONResponse(content=data, headers=_age_headers(_apex_last_ok))
 
 
 @app.get("/api/apex/ticker/{symbol}")
@@ -578,26 +857,24 @@ async def get_apex_ticker(symbol: str):
     if not symbol.endswith("USDT"):
         symbol = f"{symbol}USDT"
     
-    async with ApexClient() as client:
-        ticker = await client.get_ticker(symbol)
-        if not ticker:
-            raise HTTPException(status_code=404, detail=f"No data for {symbol}")
-        
-        orderbook = await client.get_orderbook(symbol)
-        
-        return {
-            "ticker": ticker.to_dict(),
-            "orderbook": orderbook.to_dict() if orderbook else None,
-            "source": "apex"
-        }
+    ticker, orderbook = await asyncio.gather(
+        _apex_client.get_ticker(symbol), _apex_client.get_orderbook(symbol)
+    )
+    if not ticker:
+        raise HTTPException(status_code=404, detail=f"No data for {symbol}")
+    
+    return {
+        "ticker": ticker.to_dict(),
+        "orderbook": orderbook.to_dict() if orderbook else None,
+        "source": "apex"
+    }
 
 
 @app.get("/api/apex/symbols")
 async def get_apex_symbols():
     """Get list of all Apex perpetual symbols"""
-    async with ApexClient() as client:
-        symbols = await client.get_symbols()
-        return {"symbols": symbols, "count": len(symbols)}
+    symbols = await _apex_client.get_symbols()
+    return {"symbols": symbols, "count": len(symbols)}
 
 
 @app.get("/api/apex/funding/{symbol}")
@@ -607,15 +884,31 @@ async def get_apex_funding_history(symbol: str, limit: int = 100):
     if not symbol.endswith("USDT"):
         symbol = f"{symbol}USDT"
     
-    async with ApexClient() as client:
-        history = await client.get_funding_history(symbol, limit)
-        return {"symbol": symbol, "history": history}
+    history = await _apex_client.get_funding_history(symbol, limit)
+    return {"symbol": symbol, "history": history}
 
 
 # ============================================================================
 # COMBINED MULTI-EXCHANGE ENDPOINTS  
 # ============================================================================
 
+# Serialized combined responses, keyed by the (market data, Apex) cache generations
+_combined_cache: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+
+
+async def _combined_response(name: str, build) -> Response:
+    """Serve a combined view, rebuilding and re-serializing it only when either cache changed"""
+    await asyncio.gather(get_cached_market_data(), get_cached_apex_data())
+    
+    generation = (_market_data_generation, _apex_generation)
+    cached = _combined_cache.get(name)
+    if cached is None or cached[0] != generation:
+        cached = (generation, orjson.dumps(build(_market_data_cache, _apex_by_coin)))
+        _combined_cache[name] = cached
+    
+    return Response(content=cached[1], media_type="application/json")
+
+
 @app.get("/api/combined/market-data")
 async def get_combined_market_data():
     """
@@ -623,31 +916,7 @@ async def get_combined_market_data():
     
     Useful for comparing funding rates, OI, and liquidity across exchanges.
     """
-    hl_data = await get_cached_market_data()
-    apex_data = await get_cached_apex_data()
-    
-    # Merge by base symbol
-    combined = {}
-    
-    # Add Hyperliquid data
-    for coin, data in hl_data.items():
-        combined[coin] = {
-            "hyperliquid": data,
-            "apex": None
-        }
-    
-    # Add Apex data (convert BTCUSDT -> BTC)
-    for symbol, data in apex_data.items():
-        coin = symbol.replace("USDT", "")
-        if coin in combined:
-            combined[coin]["apex"] = data
-        else:
-            combined[coin] = {
-                "hyperliquid": None,
-                "apex": data
-            }
-    
-    return combined
+    return await _combined_response("market-data", build_combined)
 
 
 @app.get("/api/combined/funding")
@@ -657,37 +926,12 @@ async def get_combined_funding():
     
     Returns funding rate comparison for symbols available on both exchanges.
     """
-    hl_data = await get_cached_market_data()
-    apex_data = await get_cached_apex_data()
-    
-    comparison = []
-    
-    for coin, hl in hl_data.items():
-        apex_symbol = f"{coin}USDT"
-        apex = apex_data.get(apex_symbol, {})
-        
-        hl_funding = hl.get("funding_rate", 0)
-        apex_ticker = apex.get("ticker", {})
-        apex_funding = apex_ticker.get("funding_rate", 0) if apex_ticker else None
-        
-        if apex_funding is not None:
-            comparison.append({
-                "coin": coin,
-                "hyperliquid_funding": hl_funding,
-                "hyperliquid_annualized": hl_funding * 3 * 365 * 100,
-                "apex_funding": apex_funding,
-                "apex_annualized": apex_funding * 3 * 365 * 100,
-                "spread": (hl_funding - apex_funding) * 100 if apex_funding else None
-            })
-    
-    # Sort by spread (arbitrage opportunity)
-    comparison.sort(key=lambda x: abs(x.get("spread", 0) or 0), reverse=True)
-    
-    return {"comparisons": comparison, "count": len(comparison)}
+    return await _combined_response("funding", build_funding)
 
 
 if __name__ == "__main__":
     print("Starting Hyperliquid Data Collector API...")
     print(f"Dashboard: http://localhost:{config.API_PORT}")
     print(f"API: http://localhost:{config.API_PORT}/api/")
-    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
+    # "auto" picks uvloop + httptools (C event loop / HTTP parser) when installed
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT, loop="auto", http="auto")
@@ -14,19 +14,115 @@ Run daily via cron:
 import sqlite3
 import os
 import sys
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Add parent to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 DB_PATH = os.environ.get('DB_PATH', 'data/historical.db')
+AUTO_VACUUM_INCREMENTAL = 2  # PRAGMA auto_vacuum value
+
+# Rows dropped by tiered retention, as one predicate so each table is walked once:
+# everything > 30 days, non-noon rows older than 7 days, non-:00 rows from 1-7 days.
+# The leading bound turns it into a single range scan of the timestamp index.
+# Timestamps are ISO 8601 text, so hour/minute are fixed-position substrings
+# (chars 12-13 / 15-16), which is much cheaper per row than strftime().
+RETENTION_DELETE_WHERE = """
+    timestamp < datetime('now', '-1 days') AND (
+        timestamp < datetime('now', '-30 days')
+        OR (timestamp < datetime('now', '-7 days') AND substr(timestamp, 12, 2) != '12')
+        OR (timestamp >= datetime('now', '-7 days') AND substr(timestamp, 15, 2) != '00')
+    )
+"""
+
+# Time-only indexes the retention predicate needs (also created by HistoricalStorage)
+TIMESTAMP_INDEXES = {
+    "idx_snapshots_time": "snapshots",
+    "idx_price_time": "price_history",
+    "idx_events_time": "liquidation_events",
+}
 
 def get_db_size(path: str) -> float:
     """Get database size in MB"""
     return os.path.getsize(path) / (1024 * 1024)
 
-def run_maintenance(db_path: str = DB_PATH, dry_run: bool = False):
+
+def reclaim_space(conn: sqlite3.Connection, full: bool = False) -> str:
+    """
+    Return freed pages to the filesystem.
+    
+    Uses incremental_vacuum, which only truncates freelist pages, when the
+    database supports it. A full VACUUM rewrites the whole file (2x disk,
+    writers blocked), so it only runs when asked for or once to switch an
+    older database to auto_vacuum=INCREMENTAL.
+    """
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    
+    if full or mode != AUTO_VACUUM_INCREMENTAL:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # applied by the VACUUM below
+        conn.execute("VACUUM")
+        return "VACUUM complete" if full else "VACUUM complete (database switched to incremental auto-vacuum)"
+    
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # executescript steps the pragma to completion; execute() would free a single page
+    conn.executescript(f"PRAGMA incremental_vacuum({freelist});")
+    return f"Incremental vacuum freed {freelist:,} pages"
+
+
+def ensure_timestamp_indexes(conn: sqlite3.Connection):
+    """Create missing timestamp indexes so retention deletes range-scan instead of full-scan"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for index, table in TIMESTAMP_INDEXES.items():
+        if index not in existing:
+            print(f"  Creating index {index} on {table}(timestamp)...")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table}(timestamp)")
+            conn.execute(f"ANALYZE {table}")
+    conn.commit()
+
+
+def delete_in_hour_ranges(conn: sqlite3.Connection, table: str, predicate: str) -> int:
+    """
+    Delete rows matching predicate one hour of timestamps at a time, committing each step.
+    
+    Short transactions keep the write lock and WAL growth small, so the
+    collector and API stay responsive and the sweep is safe to interrupt.
+    A passive checkpoint every 24 windows keeps the WAL from growing to the
+    size of everything deleted.
+    Only rows older than 1 day are visited (retention never touches newer ones).
+    """
+    lo, cutoff = conn.execute(f"SELECT MIN(timestamp), datetime('now', '-1 days') FROM {table}").fetchone()
+    if lo is None:
+        return 0
+    
+    hour = datetime.fromisoformat(lo[:13].replace(" ", "T") + ":00")
+    deleted = 0
+    windows = 0
+    
+    while lo < cutoff:
+        hour += timedelta(hours=1)
+        hi = min(hour.isoformat(), cutoff)
+        if hi <= lo:
+            continue
+        
+        windows += 1
+        if windows % 24 == 0:
+            # Fold a day's worth of WAL frames back into the main file between windows
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(
+            f"DELETE FROM {table} WHERE timestamp >= ? AND timestamp < ? AND ({predicate})",
+            (lo, hi),
+        )
+        deleted += cur.rowcount
+        conn.commit()
+        lo = hi
+    
+    return deleted
+
+
+def run_maintenance(db_path: str = DB_PATH, dry_run: bool = False, full_vacuum: bool = False):
     """
     Run database maintenance with tiered retention.
     """
@@ -41,107 +137,55 @@ def run_maintenance(db_path: str = DB_PATH, dry_run: bool = False):
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
     
+    if not dry_run:
+        # Batch-job settings: WAL lets the collector/API keep reading during the sweep,
+        # NORMAL sync skips the per-commit fsync of the main file
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-262144;
+        """)
+        ensure_timestamp_indexes(conn)
+    
     # Get current counts
     cur.execute("SELECT COUNT(*) FROM snapshots")
     count_before = cur.fetchone()[0]
     print(f"Snapshots before: {count_before:,}")
     
-    # === Step 1: Delete data older than 30 days ===
-    print("\n[1] Deleting data > 30 days old...")
-    cur.execute("""
-        SELECT COUNT(*) FROM snapshots 
-        WHERE timestamp < datetime('now', '-30 days')
-    """)
-    old_count = cur.fetchone()[0]
-    print(f"  Found {old_count:,} records to delete")
-    
-    if not dry_run and old_count > 0:
-        cur.execute("""
-            DELETE FROM snapshots 
-            WHERE timestamp < datetime('now', '-30 days')
+    # === Steps 1-3: Tiered retention, one pass per table ===
+    #  [1] > 30 days: delete
+    #  [2] 7-30 days: keep daily (noon UTC)
+    #  [3] 1-7 days: keep hourly (:00 minute)
+    if dry_run:
+        # One scan reports all three tiers
+        cur.execute(f"""
+            SELECT
+                COALESCE(SUM(timestamp < datetime('now', '-30 days')), 0),
+                COALESCE(SUM(timestamp >= datetime('now', '-30 days') AND timestamp < datetime('now', '-7 days')), 0),
+                COALESCE(SUM(timestamp >= datetime('now', '-7 days')), 0)
+            FROM snapshots
+            WHERE {RETENTION_DELETE_WHERE}
         """)
-        conn.commit()
-        print(f"  Deleted {cur.rowcount:,} records")
-    
-    # === Step 2: Downsample 7-30 day old data to daily ===
-    print("\n[2] Downsampling 7-30 day data to daily (keep noon UTC)...")
-    cur.execute("""
-        SELECT COUNT(*) FROM snapshots 
-        WHERE timestamp < datetime('now', '-7 days')
-          AND timestamp >= datetime('now', '-30 days')
-          AND strftime('%H', timestamp) != '12'
-    """)
-    downsample_count = cur.fetchone()[0]
-    print(f"  Found {downsample_count:,} non-noon records to delete")
-    
-    if not dry_run and downsample_count > 0:
-        cur.execute("""
-            DELETE FROM snapshots 
-            WHERE timestamp < datetime('now', '-7 days')
-              AND timestamp >= datetime('now', '-30 days')
-              AND strftime('%H', timestamp) != '12'
-        """)
-        conn.commit()
-        print(f"  Deleted {cur.rowcount:,} records")
-    
-    # === Step 3: Downsample 1-7 day old data to hourly ===
-    print("\n[3] Downsampling 1-7 day data to hourly (keep :00 minute)...")
-    cur.execute("""
-        SELECT COUNT(*) FROM snapshots 
-        WHERE timestamp < datetime('now', '-1 days')
-          AND timestamp >= datetime('now', '-7 days')
-          AND strftime('%M', timestamp) != '00'
-    """)
-    hourly_count = cur.fetchone()[0]
-    print(f"  Found {hourly_count:,} non-hourly records to delete")
-    
-    if not dry_run and hourly_count > 0:
-        cur.execute("""
-            DELETE FROM snapshots 
-            WHERE timestamp < datetime('now', '-1 days')
-              AND timestamp >= datetime('now', '-7 days')
-              AND strftime('%M', timestamp) != '00'
-        """)
-        conn.commit()
-        print(f"  Deleted {cur.rowcount:,} records")
-    
-    # === Step 4: Same for price_history ===
-    print("\n[4] Applying same retention to price_history...")
-    
-    if not dry_run:
-        # Delete > 30 days
-        cur.execute("""
-            DELETE FROM price_history 
-            WHERE timestamp < datetime('now', '-30 days')
-        """)
-        deleted_30 = cur.rowcount
-        
-        # Downsample 7-30 days to daily
-        cur.execute("""
-            DELETE FROM price_history 
-            WHERE timestamp < datetime('now', '-7 days')
-              AND timestamp >= datetime('now', '-30 days')
-              AND strftime('%H', timestamp) != '12'
-        """)
-        deleted_daily = cur.rowcount
-        
-        # Downsample 1-7 days to hourly
-        cur.execute("""
-            DELETE FROM price_history 
-            WHERE timestamp < datetime('now', '-1 days')
-              AND timestamp >= datetime('now', '-7 days')
-              AND strftime('%M', timestamp) != '00'
-        """)
-        deleted_hourly = cur.rowcount
-        
-        conn.commit()
-        print(f"  Deleted {deleted_30 + deleted_daily + deleted_hourly:,} price records")
+        old_count, daily_count, hourly_count = cur.fetchone()
+        print(f"\n[1] Found {old_count:,} records > 30 days old to delete")
+        print(f"[2] Found {daily_count:,} non-noon 7-30 day records to delete")
+        print(f"[3] Found {hourly_count:,} non-hourly 1-7 day records to delete")
+    else:
+        # [4] price_history gets the same retention
+        print("\n[1-4] Applying tiered retention to snapshots and price_history...")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")  # Keep the WAL bounded during the sweep
+        deleted_snapshots = delete_in_hour_ranges(conn, "snapshots", RETENTION_DELETE_WHERE)
+        print(f"  Deleted {deleted_snapshots:,} snapshot records")
+        deleted_prices = delete_in_hour_ranges(conn, "price_history", RETENTION_DELETE_WHERE)
+        print(f"  Deleted {deleted_prices:,} price records")
     
-    # === Step 5: VACUUM to reclaim space ===
-    print("\n[5] Running VACUUM to reclaim space...")
+    # === Step 5: Reclaim space ===
+    print("\n[5] Reclaiming space...")
     if not dry_run:
-        conn.execute("VACUUM")
-        print("  VACUUM complete")
+        print(f"  {reclaim_space(conn, full=full_vacuum)}")
+        conn.execute("PRAGMA optimize")  # Cheap planner statistics refresh
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # Shrink the WAL file back to zero bytes
     
     conn.close()
     
@@ -171,9 +215,32 @@ def analyze_db(db_path: str = DB_PATH):
     conn = sqlite3.connect(db_path)
     cur = conn.cursor()
     
+    # Everything about snapshots in one scan: age buckets, retention slots, totals.
+    # The cutoffs are computed once in the joined subquery instead of per row.
+    cur.execute("""
+        SELECT
+            COALESCE(SUM(timestamp >= d1), 0),
+            COALESCE(SUM(timestamp < d1 AND timestamp >= d7), 0),
+            COALESCE(SUM(timestamp < d7 AND timestamp >= d30), 0),
+            COALESCE(SUM(timestamp < d30), 0),
+            COUNT(DISTINCT CASE WHEN timestamp < d1 AND timestamp >= d7 THEN substr(timestamp, 1, 13) END),
+            COUNT(DISTINCT CASE WHEN timestamp < d7 AND timestamp >= d30 THEN substr(timestamp, 1, 10) END),
+            COUNT(*),
+            MIN(timestamp),
+            MAX(timestamp)
+        FROM snapshots, (
+            SELECT datetime('now', '-1 days') AS d1,
+                   datetime('now', '-7 days') AS d7,
+                   datetime('now', '-30 days') AS d30
+        )
+    """)
+    (last_24h, days_1_7, days_7_30, older,
+     hourly_slots, daily_slots, current, min_ts, max_ts) = cur.fetchone()
+    
     # Table sizes
     print("Table record counts:")
-    for table in ['snapshots', 'price_history', 'liquidation_events']:
+    print(f"  snapshots: {current:,}")
+    for table in ['price_history', 'liquidation_events']:
         try:
             cur.execute(f"SELECT COUNT(*) FROM {table}")
             count = cur.fetchone()[0]
@@ -182,59 +249,16 @@ def analyze_db(db_path: str = DB_PATH):
             pass
     
     # Date range
-    cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM snapshots")
-    min_ts, max_ts = cur.fetchone()
     print(f"\nDate range: {min_ts[:10] if min_ts else 'N/A'} to {max_ts[:10] if max_ts else 'N/A'}")
     
     # Data by age
     print("\nSnapshots by age:")
-    cur.execute("""
-        SELECT 
-            CASE 
-                WHEN timestamp >= datetime('now', '-1 days') THEN 'Last 24h'
-                WHEN timestamp >= datetime('now', '-7 days') THEN '1-7 days'
-                WHEN timestamp >= datetime('now', '-30 days') THEN '7-30 days'
-                ELSE '30+ days'
-            END as age,
-            COUNT(*) as cnt
-        FROM snapshots
-        GROUP BY age
-        ORDER BY 
-            CASE age
-                WHEN 'Last 24h' THEN 1
-                WHEN '1-7 days' THEN 2
-                WHEN '7-30 days' THEN 3
-                ELSE 4
-            END
-    """)
-    for row in cur.fetchall():
-        print(f"  {row[0]}: {row[1]:,}")
-    
-    # Estimated size after maintenance
-    cur.execute("""
-        SELECT COUNT(*) FROM snapshots 
-        WHERE timestamp >= datetime('now', '-1 days')
-    """)
-    last_24h = cur.fetchone()[0]
-    
-    cur.execute("""
-        SELECT COUNT(DISTINCT strftime('%Y-%m-%d %H', timestamp)) FROM snapshots 
-        WHERE timestamp < datetime('now', '-1 days')
-          AND timestamp >= datetime('now', '-7 days')
-    """)
-    hourly_slots = cur.fetchone()[0]
-    
-    cur.execute("""
-        SELECT COUNT(DISTINCT strftime('%Y-%m-%d', timestamp)) FROM snapshots 
-        WHERE timestamp < datetime('now', '-7 days')
-          AND timestamp >= datetime('now', '-30 days')
-    """)
-    daily_slots = cur.fetchone()[0]
+    for label, count in [('Last 24h', last_24h), ('1-7 days', days_1_7), ('7-30 days', days_7_30), ('30+ days', older)]:
+        if count:
+            print(f"  {label}: {count:,}")
     
     # Estimate: ~190 coins per slot
     estimated_after = last_24h + (hourly_slots * 190) + (daily_slots * 190)
-    cur.execute("SELECT COUNT(*) FROM snapshots")
-    current = cur.fetchone()[0]
     
     reduction_pct = (1 - estimated_after / current) * 100 if current > 0 else 0
     print(f"\nEstimated after maintenance: ~{estimated_after:,} records ({reduction_pct:.0f}% reduction)")
@@ -249,10 +273,11 @@ if __name__ == "__main__":
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done without making changes")
     parser.add_argument("--analyze", action="store_true", help="Just show database statistics")
     parser.add_argument("--db", default=DB_PATH, help="Path to database")
+    parser.add_argument("--full-vacuum", action="store_true", help="Rewrite the whole file with VACUUM (slow, rare manual defrag)")
     
     args = parser.parse_args()
     
     if args.analyze:
         analyze_db(args.db)
     else:
-        run_maintenance(args.db, dry_run=args.dry_run)
+        run_maintenance(args.db, dry_run=args.dry_run, full_vacuum=args.full_vacuum)
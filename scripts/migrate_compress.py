@@ -2,7 +2,8 @@
 """
 Migration Script: Compress existing clusters_json data
 
-This script compresses all uncompressed clusters_json data in the database.
+This script compresses all uncompressed clusters_json data in the database and
+rewrites older base64 "ZLIB:" text rows as raw binary blobs.
 Run once after updating historical_storage.py to use compression.
 
 Usage:
@@ -10,28 +11,51 @@ Usage:
     python scripts/migrate_compress.py --db data/historical.db --dry-run
 """
 import sqlite3
+import base64
 import json
 import zlib
-import base64
 import os
 import sys
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Compression marker (must match historical_storage.py)
-COMPRESSION_MARKER = "ZLIB:"
+from src.historical_storage import LEGACY_COMPRESSION_MARKER, compress_json_bytes
 
 
-def compress_json(data: dict) -> str:
-    """Compress JSON data with zlib, return base64-encoded string"""
-    json_bytes = json.dumps(data, separators=(',', ':')).encode('utf-8')
-    compressed = zlib.compress(json_bytes, level=6)
-    encoded = base64.b64encode(compressed).decode('ascii')
-    return COMPRESSION_MARKER + encoded
+def _compress_row(row: Tuple[int, str]) -> Tuple[int, Optional[bytes], Optional[str]]:
+    """Compress one (id, clusters_json) row in a worker process, returns (id, compressed, error)"""
+    row_id, clusters_json = row
+    try:
+        return row_id, to_blob(clusters_json), None
+    except Exception as e:
+        return row_id, None, str(e)
 
 
-def is_compressed(data: str) -> bool:
-    """Check if data is already compressed"""
-    return data is not None and data.startswith(COMPRESSION_MARKER)
+def minified_json_bytes(clusters_json: str) -> bytes:
+    """
+    Return clusters_json as compact UTF-8 JSON bytes.
+    
+    Rows written by the collector are already compact, so they are encoded
+    as-is. Only rows with ", " / ": " separators in the first bytes are
+    parsed and re-serialized. Either way NaN/Infinity written by json.dumps
+    pass through unchanged; decompress_json reads them with the tolerant loader.
+    """
+    raw = clusters_json.encode('utf-8')
+    head = raw[:200]
+    if b', ' in head or b': ' in head or b'\n' in head:
+        raw = json.dumps(json.loads(clusters_json), separators=(',', ':')).encode('utf-8')
+    return raw
+
+
+def to_blob(clusters_json: str) -> bytes:
+    """Convert a text row (plain JSON or base64-wrapped zlib) to the binary blob format"""
+    if clusters_json.startswith(LEGACY_COMPRESSION_MARKER):
+        # Plain zlib: inflate and recompress with the preset dictionary
+        raw = zlib.decompress(base64.b64decode(clusters_json[len(LEGACY_COMPRESSION_MARKER):]))
+        return compress_json_bytes(raw)
+    return compress_json_bytes(minified_json_bytes(clusters_json))
 
 
 def get_db_size(path: str) -> float:
@@ -39,9 +63,12 @@ def get_db_size(path: str) -> float:
     return os.path.getsize(path) / (1024 * 1024)
 
 
-def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000):
+def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000, workers: int = None):
     """
     Compress all uncompressed clusters_json data.
+    
+    Compression (the CPU-bound part) runs in a process pool while the main
+    process fetches the next batch and writes the previous one.
     """
     print(f"=== Compression Migration ===")
     print(f"Database: {db_path}")
@@ -52,20 +79,27 @@ def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000
     print(f"Size before: {size_before:.1f} MB")
     
     conn = sqlite3.connect(db_path)
+    # Bulk-update settings: WAL + NORMAL sync amortizes fsyncs, big page cache for the scan
+    conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-200000;
+    """)
     cur = conn.cursor()
     
-    # Count total and uncompressed records
-    cur.execute("SELECT COUNT(*) FROM snapshots")
-    total_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM snapshots WHERE clusters_json IS NOT NULL AND clusters_json NOT LIKE 'ZLIB:%'")
-    uncompressed_count = cur.fetchone()[0]
-    
-    cur.execute("SELECT COUNT(*) FROM snapshots WHERE clusters_json LIKE 'ZLIB:%'")
-    already_compressed = cur.fetchone()[0]
+    # Count total, text (needs work) and binary records in one scan. typeof() reads
+    # the storage class from the record header, no string comparison involved.
+    cur.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(typeof(clusters_json) = 'text'), 0),
+               COALESCE(SUM(typeof(clusters_json) = 'blob'), 0)
+        FROM snapshots
+    """)
+    total_count, uncompressed_count, already_compressed = cur.fetchone()
     
     print(f"Total records: {total_count:,}")
-    print(f"Already compressed: {already_compressed:,}")
+    print(f"Already binary: {already_compressed:,}")
     print(f"Need compression: {uncompressed_count:,}")
     print()
     
@@ -78,7 +112,7 @@ def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000
         # Show sample compression ratio
         cur.execute("""
             SELECT id, clusters_json FROM snapshots 
-            WHERE clusters_json IS NOT NULL AND clusters_json NOT LIKE 'ZLIB:%'
+            WHERE typeof(clusters_json) = 'text'
             LIMIT 10
         """)
         samples = cur.fetchall()
@@ -90,8 +124,7 @@ def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000
         for row_id, clusters_json in samples:
             original_size = len(clusters_json)
             try:
-                data = json.loads(clusters_json)
-                compressed = compress_json(data)
+                compressed = to_blob(clusters_json)
                 compressed_size = len(compressed)
                 ratio = (1 - compressed_size / original_size) * 100
                 total_original += original_size
@@ -105,7 +138,7 @@ def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000
             print(f"\nAverage compression: {avg_ratio:.0f}%")
             
             # Estimate total savings
-            cur.execute("SELECT SUM(LENGTH(clusters_json)) FROM snapshots WHERE clusters_json IS NOT NULL AND clusters_json NOT LIKE 'ZLIB:%'")
+            cur.execute("SELECT SUM(LENGTH(clusters_json)) FROM snapshots WHERE typeof(clusters_json) = 'text'")
             total_uncompressed_size = cur.fetchone()[0] or 0
             estimated_savings = total_uncompressed_size * (avg_ratio / 100) / (1024 * 1024)
             print(f"Estimated savings: ~{estimated_savings:.0f} MB")
@@ -115,38 +148,51 @@ def migrate_compress(db_path: str, dry_run: bool = False, batch_size: int = 1000
         return
     
     # Process in batches
-    print(f"Compressing in batches of {batch_size}...")
+    workers = workers or os.cpu_count()
+    print(f"Compressing in batches of {batch_size} with {workers} workers...")
     processed = 0
     errors = 0
     
-    while True:
-        cur.execute("""
-            SELECT id, clusters_json FROM snapshots 
-            WHERE clusters_json IS NOT NULL AND clusters_json NOT LIKE 'ZLIB:%'
-            LIMIT ?
-        """, (batch_size,))
-        
-        rows = cur.fetchall()
-        if not rows:
-            break
-        
-        for row_id, clusters_json in rows:
-            try:
-                data = json.loads(clusters_json)
-                compressed = compress_json(data)
-                cur.execute("UPDATE snapshots SET clusters_json = ? WHERE id = ?", (compressed, row_id))
-                processed += 1
-            except Exception as e:
-                print(f"  Error compressing ID {row_id}: {e}")
-                errors += 1
-        
-        conn.commit()
-        print(f"  Processed {processed:,} / {uncompressed_count:,} ({processed * 100 // uncompressed_count}%)")
+    # One streaming read over the table (a single O(N) scan), updates go through
+    # a second cursor. Rewritten rows become BLOBs, so the scan never revisits them.
+    read_cur = conn.cursor()
+    write_cur = conn.cursor()
+    read_cur.execute("""
+        SELECT id, clusters_json FROM snapshots 
+        WHERE typeof(clusters_json) = 'text'
+    """)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = read_cur.fetchmany(batch_size)
+        while rows:
+            # Hand the batch to the workers, then read the next one while they compress
+            results = executor.map(_compress_row, rows, chunksize=64)
+            next_rows = read_cur.fetchmany(batch_size)
+            
+            updates = []
+            for row_id, compressed, error in results:
+                if error is not None:
+                    print(f"  Error compressing ID {row_id}: {error}")
+                    errors += 1
+                else:
+                    updates.append((compressed, row_id))
+            
+            # One prepared statement and one transaction for the whole batch
+            conn.execute("BEGIN IMMEDIATE")
+            write_cur.executemany("UPDATE snapshots SET clusters_json = ? WHERE id = ?", updates)
+            processed += len(updates)
+            conn.commit()
+            print(f"  Processed {processed:,} / {uncompressed_count:,} ({processed * 100 // uncompressed_count}%)")
+            
+            rows = next_rows
     
     print(f"\nCompression complete: {processed:,} records, {errors} errors")
     
-    # Vacuum to reclaim space
+    # Vacuum to reclaim space. Every row was rewritten, so a one-off full VACUUM
+    # pays off here; it also switches the file to incremental auto-vacuum so
+    # routine maintenance never needs another full rewrite.
     print("\nRunning VACUUM to reclaim space...")
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("VACUUM")
     conn.close()
     
@@ -162,6 +208,7 @@ if __name__ == "__main__":
     parser.add_argument("--db", default="data/historical.db", help="Path to database")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done")
     parser.add_argument("--batch-size", type=int, default=1000, help="Records per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Compression processes (default: CPU count)")
     
     args = parser.parse_args()
     
@@ -169,4 +216,4 @@ if __name__ == "__main__":
         print(f"Database not found: {args.db}")
         sys.exit(1)
     
-    migrate_compress(args.db, dry_run=args.dry_run, batch_size=args.batch_size)
+    migrate_compress(args.db, dry_run=args.dry_run, batch_size=args.batch_size, workers=args.workers)
@@ -7,17 +7,69 @@ liquidation clusters like we do for Hyperliquid. We collect market data only.
 """
 import asyncio
 import httpx
-from typing import Dict, List, Optional
-from dataclasses import dataclass, field, asdict
+import orjson
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 import logging
 
+from .config import config
+from .rate_limit import AsyncLimiter
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://omni.apex.exchange/api/v3"
+SYMBOLS_TTL_SECONDS = 3600  # The contract list changes rarely
+
+# Major assets fetched first in get_all_market_data
+_PRIORITY = ("BTCUSDT", "ETHUSDT", "SOLUSDT", "AVAXUSDT", "DOGEUSDT",
+             "LINKUSDT", "ARBUSDT", "OPUSDT", "APTUSDT", "SUIUSDT")
+_PRIORITY_SET = frozenset(_PRIORITY)
+
+# Transient failures worth retrying within a scan: rate limiting and gateway errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 2.0
+RETRY_AFTER_MAX = 10.0  # Cap on a server-requested Retry-After, so one symbol can't stall the scan
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Exponential backoff with jitter, or the server's Retry-After (in seconds) when given"""
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_AFTER_MAX)
+        except ValueError:
+            pass  # HTTP-date form, fall back to backoff
+    return min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY) + random.uniform(0, 0.1)
+
+
+def _utcnow_iso() -> str:
+    """Current UTC time as an ISO 8601 string"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+# One pooled HTTP client for the whole process, so keep-alive connections (and
+# their TCP + TLS handshakes) are reused across ApexClient sessions
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_client_lock = asyncio.Lock()
 
 
-@dataclass
+async def _get_shared_client() -> httpx.AsyncClient:
+    """Create the shared client on first use"""
+    global _shared_client
+    async with _shared_client_lock:
+        if _shared_client is None or _shared_client.is_closed:
+            _shared_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=3.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=60.0),
+            )
+        return _shared_client
+
+
+@dataclass(slots=True)
 class ApexTicker:
     """Ticker data for a single symbol"""
     symbol: str
@@ -34,13 +86,30 @@ class ApexTicker:
     price_change_24h_pct: float
     high_24h: float
     low_24h: float
-    timestamp: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    timestamp: str = field(default_factory=_utcnow_iso)
     
     def to_dict(self) -> dict:
-        return asdict(self)
+        # Flat struct: a literal is much cheaper than asdict()'s recursive copy
+        return {
+            "symbol": self.symbol,
+            "last_price": self.last_price,
+            "mark_price": self.mark_price,
+            "index_price": self.index_price,
+            "open_interest": self.open_interest,
+            "open_interest_usd": self.open_interest_usd,
+            "volume_24h": self.volume_24h,
+            "volume_24h_usd": self.volume_24h_usd,
+            "funding_rate": self.funding_rate,
+            "predicted_funding_rate": self.predicted_funding_rate,
+            "next_funding_time": self.next_funding_time,
+            "price_change_24h_pct": self.price_change_24h_pct,
+            "high_24h": self.high_24h,
+            "low_24h": self.low_24h,
+            "timestamp": self.timestamp,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class ApexOrderBook:
     """Order book snapshot"""
     symbol: str
@@ -55,7 +124,37 @@ class ApexOrderBook:
     imbalance_1_pct: float  # (bids - asks) / (bids + asks)
     
     def to_dict(self) -> dict:
-        return asdict(self)
+        return {
+            "symbol": self.symbol,
+            "timestamp": self.timestamp,
+            "best_bid": self.best_bid,
+            "best_ask": self.best_ask,
+            "spread_pct": self.spread_pct,
+            "bid_depth_1_pct": self.bid_depth_1_pct,
+            "ask_depth_1_pct": self.ask_depth_1_pct,
+            "bid_depth_2_pct": self.bid_depth_2_pct,
+            "ask_depth_2_pct": self.ask_depth_2_pct,
+            "imbalance_1_pct": self.imbalance_1_pct,
+        }
+
+
+def _depth_within(levels: list, threshold_1: float, threshold_2: float, is_bid: bool) -> Tuple[float, float]:
+    """
+    USD depth of [[price, size], ...] levels inside the 1% and 2% thresholds.
+    
+    Each level is converted once and feeds both sums. Levels arrive best-first,
+    so the scan stops at the first one beyond the 2% threshold.
+    """
+    depth_1 = depth_2 = 0.0
+    for level in levels:
+        price = float(level[0])
+        if (price < threshold_2) if is_bid else (price > threshold_2):
+            break
+        notional = price * float(level[1])
+        depth_2 += notional
+        if (price >= threshold_1) if is_bid else (price <= threshold_1):
+            depth_1 += notional
+    return depth_1, depth_2
 
 
 class ApexClient:
@@ -72,31 +171,70 @@ class ApexClient:
     def __init__(self, base_url: str = BASE_URL):
         self.base_url = base_url
         self._client: Optional[httpx.AsyncClient] = None
+        self._limiter = AsyncLimiter(config.APEX_REQUESTS_PER_SECOND, time_period=1.0)
+        self._symbols_cache: Optional[Tuple[float, List[str]]] = None  # (fetched_at, symbols)
     
     async def __aenter__(self):
-        self._client = httpx.AsyncClient(timeout=30.0)
+        self._client = await _get_shared_client()
         return self
     
     async def __aexit__(self, *args):
-        if self._client:
-            await self._client.aclose()
+        # The pooled client outlives the session, see aclose_shared()
+        self._client = None
+    
+    @staticmethod
+    async def aclose_shared():
+        """Close the process-wide HTTP client (call once on shutdown)"""
+        global _shared_client
+        async with _shared_client_lock:
+            if _shared_client is not None:
+                await _shared_client.aclose()
+                _shared_client = None
     
     async def _get(self, endpoint: str, params: dict = None) -> Optional[dict]:
-        """Make GET request"""
-        try:
-            url = f"{self.base_url}{endpoint}"
-            response = await self._client.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error fetching {endpoint}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error fetching {endpoint}: {e}")
-            return None
+        """Make GET request, retrying transient failures (429, 5xx, connection errors)"""
+        url = f"{self.base_url}{endpoint}"
+        
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            try:
+                async with self._limiter:
+                    response = await self._client.get(url, params=params)
+                
+                if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                    delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+                    logger.warning(f"HTTP {response.status_code} fetching {endpoint}, retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                
+                response.raise_for_status()
+                # orjson straight from the body bytes, skipping httpx's charset sniffing + stdlib json
+                return orjson.loads(response.content)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    logger.error(f"Connection error fetching {endpoint}: {e}")
+                    return None
+                delay = _retry_delay(attempt)
+                logger.warning(f"Connection error fetching {endpoint} ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except httpx.HTTPError as e:
+                logger.error(f"HTTP error fetching {endpoint}: {e}")
+                return None
+            except Exception as e:
+                logger.error(f"Error fetching {endpoint}: {e}")
+                return None
+        
+        return None
     
-    async def get_symbols(self) -> List[str]:
-        """Get list of all perpetual symbols"""
+    async def get_symbols(self, force_refresh: bool = False) -> List[str]:
+        """Get list of all perpetual symbols (cached for SYMBOLS_TTL_SECONDS)"""
+        if (
+            not force_refresh
+            and self._symbols_cache
+            and time.monotonic() - self._symbols_cache[0] < SYMBOLS_TTL_SECONDS
+        ):
+            return self._symbols_cache[1]
+        
         data = await self._get("/symbols")
         if not data:
             return []
@@ -111,6 +249,8 @@ class ApexClient:
             api_symbol = symbol.replace("-", "")
             symbols.append(api_symbol)
         
+        if symbols:
+            self._symbols_cache = (time.monotonic(), symbols)
         return symbols
     
     async def get_ticker(self, symbol: str) -> Optional[ApexTicker]:
@@ -162,33 +302,24 @@ class ApexClient:
         try:
             best_bid = float(bids[0][0])
             best_ask = float(asks[0][0])
+            if not 0 < best_bid < best_ask:
+                # Crossed, locked or zero-priced book: stale/partial upstream data, skip the depth work
+                logger.warning(f"Invalid orderbook for {symbol}: bid {best_bid} / ask {best_ask}")
+                return None
+            
             mid_price = (best_bid + best_ask) / 2
             spread_pct = (best_ask - best_bid) / mid_price * 100
             
-            # Calculate depth within 1% and 2% of mid price
-            def calc_depth(orders: list, is_bid: bool, pct: float) -> float:
-                depth = 0
-                threshold = mid_price * (1 - pct / 100) if is_bid else mid_price * (1 + pct / 100)
-                for order in orders:
-                    price = float(order[0])
-                    size = float(order[1])
-                    if is_bid and price >= threshold:
-                        depth += price * size
-                    elif not is_bid and price <= threshold:
-                        depth += price * size
-                return depth
-            
-            bid_depth_1 = calc_depth(bids, True, 1.0)
-            ask_depth_1 = calc_depth(asks, False, 1.0)
-            bid_depth_2 = calc_depth(bids, True, 2.0)
-            ask_depth_2 = calc_depth(asks, False, 2.0)
+            # Depth within 1% and 2% of mid price, one pass per side
+            bid_depth_1, bid_depth_2 = _depth_within(bids, mid_price * 0.99, mid_price * 0.98, is_bid=True)
+            ask_depth_1, ask_depth_2 = _depth_within(asks, mid_price * 1.01, mid_price * 1.02, is_bid=False)
             
             total_1 = bid_depth_1 + ask_depth_1
             imbalance_1 = (bid_depth_1 - ask_depth_1) / total_1 if total_1 > 0 else 0
             
             return ApexOrderBook(
                 symbol=symbol,
-                timestamp=datetime.now(timezone.utc).isoformat(),
+                timestamp=_utcnow_iso(),
                 best_bid=best_bid,
                 best_ask=best_ask,
                 spread_pct=spread_pct,
@@ -219,43 +350,32 @@ class ApexClient:
         if symbols is None:
             symbols = await self.get_symbols()
         
-        # Prioritize major assets
-        priority = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "AVAXUSDT", "DOGEUSDT", 
-                    "LINKUSDT", "ARBUSDT", "OPUSDT", "APTUSDT", "SUIUSDT"]
+        # Reorder: priority first, then rest (set lookups, O(N))
+        symbols_set = set(symbols)
+        ordered = [s for s in _PRIORITY if s in symbols_set]
+        ordered += [s for s in symbols if s not in _PRIORITY_SET]
         
-        # Reorder: priority first, then rest
-        ordered = [s for s in priority if s in symbols]
-        ordered += [s for s in symbols if s not in priority]
+        # Top 50 fully concurrent; the limiter in _get paces the actual requests
+        ordered = ordered[:50]
+        fetched = await asyncio.gather(
+            *(self._fetch_symbol_data(symbol) for symbol in ordered),
+            return_exceptions=True
+        )
         
         results = {}
-        
-        # Fetch in batches to avoid rate limits
-        batch_size = 10
-        for i in range(0, min(len(ordered), 50), batch_size):  # Limit to top 50
-            batch = ordered[i:i + batch_size]
-            
-            tasks = []
-            for symbol in batch:
-                tasks.append(self._fetch_symbol_data(symbol))
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for symbol, result in zip(batch, batch_results):
-                if isinstance(result, Exception):
-                    logger.error(f"Error fetching {symbol}: {result}")
-                elif result:
-                    results[symbol] = result
-            
-            # Small delay between batches
-            if i + batch_size < len(ordered):
-                await asyncio.sleep(0.5)
+        for symbol, result in zip(ordered, fetched):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching {symbol}: {result}")
+            elif result:
+                results[symbol] = result
         
         return results
     
     async def _fetch_symbol_data(self, symbol: str) -> Optional[dict]:
         """Fetch ticker and orderbook for a single symbol"""
-        ticker = await self.get_ticker(symbol)
-        orderbook = await self.get_orderbook(symbol)
+        ticker, orderbook = await asyncio.gather(
+            self.get_ticker(symbol), self.get_orderbook(symbol)
+        )
         
         if not ticker:
             return None
@@ -305,5 +425,7 @@ if __name__ == "__main__":
                 print(f"  Bid depth (1%): ${orderbook.bid_depth_1_pct:,.0f}")
                 print(f"  Ask depth (1%): ${orderbook.ask_depth_1_pct:,.0f}")
                 print(f"  Imbalance: {orderbook.imbalance_1_pct:+.2%}")
+        
+        await ApexClient.aclose_shared()
     
     asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Cross-Exchange Merge Helpers
+
+Builds the combined Hyperliquid + Apex views served by the /api/combined/*
+endpoints. Pure, fully typed functions with no FastAPI or I/O dependencies.
+"""
+from operator import itemgetter
+from typing import Any, Dict, Final, List, Optional, Tuple
+
+# 8-hour funding rate -> annualized percent (3 periods/day)
+FUNDING_ANNUALIZED_PCT: Final[float] = 3 * 365 * 100.0
+
+
+def build_combined(hl_data: Dict[str, Any], apex_by_coin: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge Hyperliquid and Apex market data by base symbol"""
+    # Hyperliquid coins first, then Apex-only ones
+    combined: Dict[str, Any] = {}
+    for coin, data in hl_data.items():
+        combined[coin] = {"hyperliquid": data, "apex": apex_by_coin.get(coin)}
+    for coin, data in apex_by_coin.items():
+        if coin not in combined:
+            combined[coin] = {"hyperliquid": None, "apex": data}
+    
+    return combined
+
+
+def build_funding(hl_data: Dict[str, Any], apex_by_coin: Dict[str, Any]) -> Dict[str, Any]:
+    """Funding rate comparison for coins on both exchanges, largest spread first"""
+    # (abs spread, row) pairs so the sort key is computed once per row
+    ranked: List[Tuple[float, Dict[str, Any]]] = []
+    
+    for coin, hl in hl_data.items():
+        apex_ticker = apex_by_coin.get(coin, {}).get("ticker")
+        if not apex_ticker:
+            continue
+        
+        hl_funding: float = hl.get("funding_rate", 0)
+        apex_funding: float = apex_ticker.get("funding_rate", 0)
+        spread: Optional[float] = (hl_funding - apex_funding) * 100 if apex_funding else None
+        
+        ranked.append((abs(spread or 0), {
+            "coin": coin,
+            "hyperliquid_funding": hl_funding,
+            "hyperliquid_annualized": hl_funding * FUNDING_ANNUALIZED_PCT,
+            "apex_funding": apex_funding,
+            "apex_annualized": apex_funding * FUNDING_ANNUALIZED_PCT,
+            "spread": spread
+        }))
+    
+    # Sort by spread (arbitrage opportunity)
+    ranked.sort(key=itemgetter(0), reverse=True)
+    comparison = [row for _, row in ranked]
+    
+    return {"comparisons": comparison, "count": len(comparison)}
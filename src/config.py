@@ -19,6 +19,7 @@ class Config:
     PRICE_BUCKET_PERCENT: float = 0.1
     MIN_CLUSTER_SIZE_USD: float = 100_000  # Lower threshold for data collection
     CLUSTER_MERGE_PERCENT: float = 0.5
+    ALERT_CLUSTER_SIZE_USD: float = 1_000_000  # Minimum cluster size for a trading signal
     
     # Assets to track
     ASSETS: List[str] = field(default_factory=lambda: [
@@ -29,6 +30,8 @@ class Config:
     
     # Rate limiting
     API_REQUESTS_PER_SECOND: int = 10
+    MAX_CONCURRENT_REQUESTS: int = 20  # Wallet lookups in flight at once during a scan
+    APEX_REQUESTS_PER_SECOND: int = 20  # Token bucket for Apex REST calls (ticker + depth per symbol)
     
     # Data storage
     DATA_DIR: str = "data"
@@ -38,9 +41,18 @@ class Config:
     MARKET_DATA_FILE: str = "data/market_data.json"
     DATABASE_FILE: str = "data/historical.db"
     
+    # Batch collection cycles into one SQLite transaction every N cycles or T seconds,
+    # whichever comes first (1 = write every cycle)
+    STORAGE_FLUSH_EVERY_CYCLES: int = 1
+    STORAGE_FLUSH_INTERVAL_SECONDS: float = 300
+    
     # API server
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8001
+    
+    # Run collection cycles inside the API server instead of a separate collector.py process
+    EMBEDDED_COLLECTOR: bool = False
+    EMBEDDED_COLLECTOR_INTERVAL_SECONDS: int = 900  # 15 minutes
 
 
 config = Config()
@@ -2,57 +2,153 @@
 Historical Data Storage Module
 Stores liquidation snapshots over time for backtesting and analysis
 
-Compression: clusters_json is compressed with zlib to reduce storage by ~70%
+Compression: clusters_json is compressed with zlib (primed with a preset
+dictionary) and stored as a raw BLOB to reduce storage by ~70%
 """
 import json
 import os
+import threading
+import time
 import zlib
 import base64
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import sqlite3
 from pathlib import Path
 
+import orjson
+
 from .config import config
 
 
 # Compression helpers
-COMPRESSION_MARKER = "ZLIB:"  # Prefix to identify compressed data
+# Current format: raw bytes (stored with SQLite's BLOB storage class, no base64),
+# a one-byte format version followed by zlib data compressed with the v1 dictionary
+BLOB_FORMAT_ZDICT_V1 = b"\x01"
+
+# Older text format, still decoded: base64 of plain zlib
+LEGACY_COMPRESSION_MARKER = "ZLIB:"
+
+# Preset dictionary primed with the JSON skeleton every clusters_json row repeats,
+# so even a single-cluster row compresses well. Never edit it in place: rows written
+# with it need these exact bytes to decode. Add a new format version instead.
+CLUSTERS_ZDICT_V1 = (
+    b'"coin":"BTC","coin":"ETH","coin":"SOL","coin":"HYPE",'
+    b'{"short":[{"coin":"","side":"short","price_low":,"price_high":,"price_center":,'
+    b'"total_size_usd":,"position_count":,"avg_leverage":},'
+    b'{"long":[{"coin":"","side":"long","price_low":,"price_high":,"price_center":,'
+    b'"total_size_usd":,"position_count":,"avg_leverage":}],'
+)
+
+
+def _utcnow() -> datetime:
+    """Current UTC time as a naive datetime (the stored timestamp format), without deprecated utcnow()"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _zdict_decompress(compressed: bytes) -> bytes:
+    """Inflate zlib data compressed with the v1 preset dictionary"""
+    decompressor = zlib.decompressobj(zdict=CLUSTERS_ZDICT_V1)
+    return decompressor.decompress(compressed) + decompressor.flush()
+
+
+def compress_json(data: dict) -> bytes:
+    """Compress JSON data with zlib + preset dictionary into a versioned binary blob"""
+    return compress_json_bytes(orjson.dumps(data))
+
+
+def compress_json_bytes(json_bytes: bytes) -> bytes:
+    """Compress already-serialized JSON into the same blob format as compress_json"""
+    compressor = zlib.compressobj(level=6, zdict=CLUSTERS_ZDICT_V1)
+    return BLOB_FORMAT_ZDICT_V1 + compressor.compress(json_bytes) + compressor.flush()
 
 
-def compress_json(data: dict) -> str:
-    """Compress JSON data with zlib, return base64-encoded string"""
-    json_bytes = json.dumps(data, separators=(',', ':')).encode('utf-8')
-    compressed = zlib.compress(json_bytes, level=6)
-    encoded = base64.b64encode(compressed).decode('ascii')
-    return COMPRESSION_MARKER + encoded
+def _loads_legacy(raw) -> dict:
+    """Parse JSON from older rows with orjson, falling back to json for NaN/Infinity written by json.dumps"""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return json.loads(raw)
 
 
-def decompress_json(data: str) -> dict:
-    """Decompress zlib-compressed JSON, handles both compressed and uncompressed"""
+def decompress_json(data) -> dict:
+    """Decompress clusters_json, handles binary, older base64 and uncompressed rows"""
     if data is None:
         return {}
     
-    # Check if compressed
-    if data.startswith(COMPRESSION_MARKER):
-        try:
-            encoded = data[len(COMPRESSION_MARKER):]
-            compressed = base64.b64decode(encoded)
-            json_bytes = zlib.decompress(compressed)
-            return json.loads(json_bytes.decode('utf-8'))
-        except Exception as e:
-            print(f"Decompression error: {e}")
-            return {}
+    try:
+        if isinstance(data, bytes):
+            if data[:1] != BLOB_FORMAT_ZDICT_V1:
+                raise ValueError(f"unknown blob format {data[:1]!r}")
+            # _loads_legacy: the migration repacks older rows as-is, and those may hold NaN/Infinity
+            return _loads_legacy(_zdict_decompress(data[1:]))
+        
+        if data.startswith(LEGACY_COMPRESSION_MARKER):
+            compressed = base64.b64decode(data[len(LEGACY_COMPRESSION_MARKER):])
+            return _loads_legacy(zlib.decompress(compressed))
+    except Exception as e:
+        print(f"Decompression error: {e}")
+        return {}
     
     # Not compressed, parse as regular JSON
     try:
-        return json.loads(data)
+        return _loads_legacy(data)
     except:
         return {}
 
 
-@dataclass
+# Hot-path statements, defined once so every call passes the same SQL text and
+# hits the persistent connection's prepared-statement cache
+_SQL_INS_SNAPSHOT = """
+    INSERT OR REPLACE INTO snapshots 
+    (timestamp, coin, current_price, total_long_at_risk, total_short_at_risk,
+     nearest_long_price, nearest_long_size, nearest_short_price, nearest_short_size,
+     clusters_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INS_PRICE = """
+    INSERT OR REPLACE INTO price_history (timestamp, coin, price)
+    VALUES (?, ?, ?)
+"""
+
+_SQL_UPSERT_LATEST = """
+    INSERT OR REPLACE INTO latest_maps (id, updated_at, maps_json)
+    VALUES (1, ?, ?)
+"""
+
+_SQL_INS_EVENT = """
+    INSERT INTO liquidation_events 
+    (timestamp, coin, price, side, cluster_size, price_move_percent, time_to_hit_minutes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Snapshot columns without clusters_json, all held in idx_snapshots_cover
+THIN_SNAPSHOT_COLUMNS = [
+    'timestamp', 'coin', 'current_price',
+    'total_long_at_risk', 'total_short_at_risk',
+    'nearest_long_price', 'nearest_long_size',
+    'nearest_short_price', 'nearest_short_size',
+]
+
+_SQL_SEL_SNAPSHOTS_THIN = f"""
+    SELECT {', '.join(THIN_SNAPSHOT_COLUMNS)} FROM snapshots
+    WHERE coin = ? AND timestamp BETWEEN ? AND ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+_SQL_SEL_SNAPSHOTS = """
+    SELECT * FROM snapshots
+    WHERE coin = ? AND timestamp BETWEEN ? AND ?
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+
+@dataclass(slots=True)
 class LiquidationSnapshot:
     """A point-in-time snapshot of liquidation data"""
     timestamp: datetime
@@ -74,15 +170,54 @@ class HistoricalStorage:
     Enables backtesting and trend analysis.
     """
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, flush_every: int = None, flush_interval: float = None):
         self.db_path = db_path or os.path.join(config.DATA_DIR, "historical.db")
+        self.flush_every = flush_every or config.STORAGE_FLUSH_EVERY_CYCLES
+        self.flush_interval = config.STORAGE_FLUSH_INTERVAL_SECONDS if flush_interval is None else flush_interval
+        
+        # Cycles queued by store_cycle but not yet written: (liq_map, prices, ts_str)
+        self._pending: List[Tuple[Dict, Dict[str, float], str]] = []
+        self._last_flush = time.monotonic()
+        
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = self._open()
         self._init_db()
     
+    def _open(self) -> sqlite3.Connection:
+        """Open the connection with the per-connection performance PRAGMAs applied"""
+        # Shared by the collector and the API's worker threads, serialized by self._lock
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # WAL makes NORMAL safe: a crash can lose the last commit, never corrupt
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size=268435456")  # 256MB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20MB page cache, kept warm by the persistent connection
+        return conn
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Use the persistent connection under the lock, as one transaction
+        (committed on success, rolled back on error).
+        """
+        with self._lock, self._conn:
+            yield self._conn
+    
+    def close(self):
+        """Close the persistent connection"""
+        with self._lock:
+            self._conn.close()
+    
     def _init_db(self):
         """Initialize database schema"""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
+            # Only takes effect on a new database (before any table exists); lets
+            # maintenance free pages with incremental_vacuum instead of a full VACUUM
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            # Journal mode is persistent, so setting it once here covers all connections
+            conn.execute("PRAGMA journal_mode=WAL")
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS snapshots (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,14 +230,24 @@ class HistoricalStorage:
                     nearest_long_size REAL,
                     nearest_short_price REAL,
                     nearest_short_size REAL,
-                    clusters_json TEXT,
+                    clusters_json TEXT,  -- compressed rows are stored as BLOBs, see compress_json
                     UNIQUE(timestamp, coin)
                 )
             """)
             
+            # Covering index: per-coin range scans over the numeric columns (get_snapshots_thin,
+            # export_to_csv) are answered from the index alone, never touching clusters_json.
+            # It also serves every coin + timestamp lookup, replacing idx_snapshots_coin_time.
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_snapshots_cover 
+                ON snapshots(coin, timestamp DESC, {', '.join(THIN_SNAPSHOT_COLUMNS[2:])})
+            """)
+            conn.execute("DROP INDEX IF EXISTS idx_snapshots_coin_time")
+            
+            # Time-only indexes for retention deletes and MIN/MAX(timestamp)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_snapshots_coin_time 
-                ON snapshots(coin, timestamp)
+                CREATE INDEX IF NOT EXISTS idx_snapshots_time 
+                ON snapshots(timestamp)
             """)
             
             conn.execute("""
@@ -120,6 +265,20 @@ class HistoricalStorage:
                 ON price_history(coin, timestamp)
             """)
             
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_price_time 
+                ON price_history(timestamp)
+            """)
+            
+            # Single-row table holding the latest full liquidation map, served as-is by the API
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS latest_maps (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    updated_at REAL NOT NULL,
+                    maps_json BLOB NOT NULL
+                )
+            """)
+            
             # Table for tracking liquidation events
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS liquidation_events (
@@ -134,59 +293,129 @@ class HistoricalStorage:
                 )
             """)
             
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_events_time 
+                ON liquidation_events(timestamp)
+            """)
+            
             conn.commit()
     
+    def _insert_snapshot(self, conn: sqlite3.Connection, liq_map: Dict, ts_str: str):
+        """Insert one snapshot row per coin (caller owns the transaction)"""
+        rows = []
+        for coin, data in liq_map.items():
+            nearest_long = data.get('nearest_long_cluster')
+            nearest_short = data.get('nearest_short_cluster')
+            
+            clusters = {
+                'long': data.get('long_liquidations', []),
+                'short': data.get('short_liquidations', [])
+            }
+            
+            rows.append((
+                ts_str,
+                coin,
+                data.get('current_price', 0),
+                data.get('total_long_at_risk_usd', 0),
+                data.get('total_short_at_risk_usd', 0),
+                nearest_long.get('price_center') if nearest_long else None,
+                nearest_long.get('total_size_usd') if nearest_long else None,
+                nearest_short.get('price_center') if nearest_short else None,
+                nearest_short.get('total_size_usd') if nearest_short else None,
+                compress_json(clusters)  # Compressed with zlib
+            ))
+        
+        conn.executemany(_SQL_INS_SNAPSHOT, rows)
+    
+    def _insert_prices(self, conn: sqlite3.Connection, prices: Dict[str, float], ts_str: str):
+        """Insert one price row per coin (caller owns the transaction)"""
+        rows = [(ts_str, coin, price) for coin, price in prices.items() if price and price > 0]
+        if rows:
+            conn.executemany(_SQL_INS_PRICE, rows)
+    
+    def _insert_latest(self, conn: sqlite3.Connection, liq_map: Dict):
+        """Replace the latest liquidation map row (caller owns the transaction)"""
+        conn.execute(_SQL_UPSERT_LATEST, (time.time(), orjson.dumps(liq_map)))
+    
     def store_snapshot(self, liq_map: Dict, timestamp: datetime = None):
         """Store a liquidation map snapshot"""
-        timestamp = timestamp or datetime.utcnow()
+        timestamp = timestamp or _utcnow()
         ts_str = timestamp.isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
-            for coin, data in liq_map.items():
-                nearest_long = data.get('nearest_long_cluster')
-                nearest_short = data.get('nearest_short_cluster')
-                
-                clusters = {
-                    'long': data.get('long_liquidations', []),
-                    'short': data.get('short_liquidations', [])
-                }
-                
-                conn.execute("""
-                    INSERT OR REPLACE INTO snapshots 
-                    (timestamp, coin, current_price, total_long_at_risk, total_short_at_risk,
-                     nearest_long_price, nearest_long_size, nearest_short_price, nearest_short_size,
-                     clusters_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    ts_str,
-                    coin,
-                    data.get('current_price', 0),
-                    data.get('total_long_at_risk_usd', 0),
-                    data.get('total_short_at_risk_usd', 0),
-                    nearest_long.get('price_center') if nearest_long else None,
-                    nearest_long.get('total_size_usd') if nearest_long else None,
-                    nearest_short.get('price_center') if nearest_short else None,
-                    nearest_short.get('total_size_usd') if nearest_short else None,
-                    compress_json(clusters)  # Compressed with zlib
-                ))
-            
-            conn.commit()
+        with self._connect() as conn:
+            self._insert_snapshot(conn, liq_map, ts_str)
         
         print(f"[HistoricalStorage] Stored snapshot for {len(liq_map)} coins at {ts_str}")
     
     def store_prices(self, prices: Dict[str, float], timestamp: datetime = None):
         """Store price snapshot"""
-        timestamp = timestamp or datetime.utcnow()
+        timestamp = timestamp or _utcnow()
         ts_str = timestamp.isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
-            for coin, price in prices.items():
-                if price and price > 0:
-                    conn.execute("""
-                        INSERT OR REPLACE INTO price_history (timestamp, coin, price)
-                        VALUES (?, ?, ?)
-                    """, (ts_str, coin, price))
-            conn.commit()
+        with self._connect() as conn:
+            self._insert_prices(conn, prices, ts_str)
+    
+    def store_cycle(self, liq_map: Dict, prices: Dict[str, float], timestamp: datetime = None):
+        """
+        Queue a liquidation snapshot and prices, then flush if the batch is due.
+        
+        With the default flush_every=1 every cycle is written immediately.
+        Queued cycles are not visible to readers until they are flushed.
+        """
+        timestamp = timestamp or _utcnow()
+        self._pending.append((liq_map, prices, timestamp.isoformat()))
+        self.flush()
+    
+    def flush(self, force: bool = False) -> int:
+        """
+        Write queued cycles (snapshots, prices and the latest map) in a single
+        transaction once flush_every cycles or flush_interval seconds have
+        accumulated, or immediately if force is set.
+        
+        Returns the number of cycles written.
+        """
+        # Held across check, swap and write so concurrent store_cycle calls keep their order
+        with self._lock:
+            if not self._pending:
+                return 0
+            
+            due = (
+                len(self._pending) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if not (force or due):
+                return 0
+            
+            pending, self._pending = self._pending, []
+            try:
+                with self._connect() as conn:
+                    for liq_map, prices, ts_str in pending:
+                        self._insert_snapshot(conn, liq_map, ts_str)
+                        self._insert_prices(conn, prices, ts_str)
+                    self._insert_latest(conn, pending[-1][0])
+            except Exception:
+                # Keep the batch for the next attempt rather than dropping it
+                self._pending = pending + self._pending
+                raise
+            
+            self._last_flush = time.monotonic()
+            
+            liq_map, _, ts_str = pending[-1]
+            batch = f" ({len(pending)} cycles)" if len(pending) > 1 else ""
+            print(f"[HistoricalStorage] Stored snapshot for {len(liq_map)} coins at {ts_str}{batch}")
+            return len(pending)
+    
+    def get_latest_updated_at(self) -> Optional[float]:
+        """Get the unix time the latest map was written, or None if there is none yet"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT updated_at FROM latest_maps WHERE id = 1").fetchone()
+            return row[0] if row else None
+    
+    def get_latest_maps_raw(self) -> Optional[Tuple[float, bytes]]:
+        """Get (updated_at, JSON bytes) of the latest liquidation map, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT updated_at, maps_json FROM latest_maps WHERE id = 1").fetchone()
+            return (row[0], bytes(row[1])) if row else None
     
     def record_liquidation_event(
         self, 
@@ -199,14 +428,10 @@ class HistoricalStorage:
         timestamp: datetime = None
     ):
         """Record when price hit a liquidation cluster"""
-        timestamp = timestamp or datetime.utcnow()
+        timestamp = timestamp or _utcnow()
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT INTO liquidation_events 
-                (timestamp, coin, price, side, cluster_size, price_move_percent, time_to_hit_minutes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
+        with self._connect() as conn:
+            conn.execute(_SQL_INS_EVENT, (
                 timestamp.isoformat(),
                 coin,
                 price,
@@ -225,17 +450,14 @@ class HistoricalStorage:
         limit: int = 1000
     ) -> List[Dict]:
         """Get historical snapshots for a coin"""
-        start_time = start_time or (datetime.utcnow() - timedelta(days=7))
-        end_time = end_time or datetime.utcnow()
+        start_time = start_time or (_utcnow() - timedelta(days=7))
+        end_time = end_time or _utcnow()
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
-                SELECT * FROM snapshots
-                WHERE coin = ? AND timestamp BETWEEN ? AND ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (coin, start_time.isoformat(), end_time.isoformat(), limit))
+        with self._connect() as conn:
+            # Row factory on the cursor, not the shared connection
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(_SQL_SEL_SNAPSHOTS, (coin, start_time.isoformat(), end_time.isoformat(), limit))
             
             results = []
             for row in cursor.fetchall():
@@ -246,6 +468,23 @@ class HistoricalStorage:
                 results.append(snap)
             return results
     
+    def get_snapshots_thin(
+        self, 
+        coin: str, 
+        start_time: datetime = None,
+        end_time: datetime = None,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """Get historical snapshots for a coin without clusters (index-only, no decompression)"""
+        start_time = start_time or (_utcnow() - timedelta(days=7))
+        end_time = end_time or _utcnow()
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(_SQL_SEL_SNAPSHOTS_THIN, (coin, start_time.isoformat(), end_time.isoformat(), limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
     def get_price_history(
         self, 
         coin: str,
@@ -253,10 +492,10 @@ class HistoricalStorage:
         end_time: datetime = None
     ) -> List[Tuple[datetime, float]]:
         """Get price history for a coin"""
-        start_time = start_time or (datetime.utcnow() - timedelta(days=7))
-        end_time = end_time or datetime.utcnow()
+        start_time = start_time or (_utcnow() - timedelta(days=7))
+        end_time = end_time or _utcnow()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
                 SELECT timestamp, price FROM price_history
                 WHERE coin = ? AND timestamp BETWEEN ? AND ?
@@ -272,20 +511,21 @@ class HistoricalStorage:
         end_time: datetime = None
     ) -> List[Dict]:
         """Get recorded liquidation events"""
-        start_time = start_time or (datetime.utcnow() - timedelta(days=30))
-        end_time = end_time or datetime.utcnow()
+        start_time = start_time or (_utcnow() - timedelta(days=30))
+        end_time = end_time or _utcnow()
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
             if coin:
-                cursor = conn.execute("""
+                cursor.execute("""
                     SELECT * FROM liquidation_events
                     WHERE coin = ? AND timestamp BETWEEN ? AND ?
                     ORDER BY timestamp DESC
                 """, (coin, start_time.isoformat(), end_time.isoformat()))
             else:
-                cursor = conn.execute("""
+                cursor.execute("""
                     SELECT * FROM liquidation_events
                     WHERE timestamp BETWEEN ? AND ?
                     ORDER BY timestamp DESC
@@ -295,7 +535,7 @@ class HistoricalStorage:
     
     def get_stats(self) -> Dict:
         """Get storage statistics"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             snapshot_count = conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
             price_count = conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0]
             event_count = conn.execute("SELECT COUNT(*) FROM liquidation_events").fetchone()[0]
@@ -319,48 +559,48 @@ class HistoricalStorage:
         """Export historical data to CSV for external analysis"""
         import csv
         
-        snapshots = self.get_snapshots(coin, limit=10000)
-        
-        if not snapshots:
-            print(f"No data for {coin}")
-            return
+        # Same window as get_snapshots' defaults
+        end_time = _utcnow()
+        start_time = end_time - timedelta(days=7)
         
-        with open(output_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'timestamp', 'coin', 'current_price', 
-                'total_long_at_risk', 'total_short_at_risk',
-                'nearest_long_price', 'nearest_long_size',
-                'nearest_short_price', 'nearest_short_size'
-            ])
-            writer.writeheader()
+        # Only the CSV columns, read from the covering index (clusters_json is never
+        # touched) and streamed from the cursor straight into the file
+        with self._connect() as conn:
+            cursor = conn.execute(
+                _SQL_SEL_SNAPSHOTS_THIN, (coin, start_time.isoformat(), end_time.isoformat(), 10000)
+            )
             
-            for snap in snapshots:
-                writer.writerow({
-                    'timestamp': snap['timestamp'],
-                    'coin': snap['coin'],
-                    'current_price': snap['current_price'],
-                    'total_long_at_risk': snap['total_long_at_risk'],
-                    'total_short_at_risk': snap['total_short_at_risk'],
-                    'nearest_long_price': snap['nearest_long_price'],
-                    'nearest_long_size': snap['nearest_long_size'],
-                    'nearest_short_price': snap['nearest_short_price'],
-                    'nearest_short_size': snap['nearest_short_size']
-                })
+            first = cursor.fetchone()
+            if first is None:
+                print(f"No data for {coin}")
+                return
+            
+            with open(output_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(THIN_SNAPSHOT_COLUMNS)
+                writer.writerow(first)
+                count = 1
+                for row in cursor:
+                    writer.writerow(row)
+                    count += 1
         
-        print(f"Exported {len(snapshots)} snapshots to {output_path}")
+        print(f"Exported {count} snapshots to {output_path}")
 
 
 # Convenience function
-def store_current_snapshot():
-    """Store current liquidation map snapshot"""
+def store_current_snapshot(db_path: str = None) -> bool:
+    """Store the latest liquidation map (as written by the collector) as a new snapshot"""
+    storage = HistoricalStorage(db_path)
     try:
-        with open(config.LIQUIDATION_MAP_FILE, 'r') as f:
-            liq_map = json.load(f)
-        
-        storage = HistoricalStorage()
-        storage.store_snapshot(liq_map)
+        latest = storage.get_latest_maps_raw()
+        if latest is None:
+            print("No liquidation map stored yet")
+            return False
         
+        storage.store_snapshot(orjson.loads(latest[1]))
         return True
     except Exception as e:
         print(f"Error storing snapshot: {e}")
         return False
+    finally:
+        storage.close()
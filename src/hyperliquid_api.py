@@ -3,15 +3,41 @@ Hyperliquid API wrapper for liquidation tracking
 """
 import asyncio
 import aiohttp
-import json
-from typing import Dict, List, Optional, Any
+import orjson
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from dataclasses import dataclass
-import time
 
 from .config import config
+from .rate_limit import AsyncLimiter
 
+# Present in a compact clearinghouseState body when the wallet has no open positions
+EMPTY_POSITIONS_MARKER = b'"assetPositions":[]'
 
-@dataclass
+
+# One pooled session for the whole process, so keep-alive connections (and
+# their TCP + TLS handshakes) are reused across HyperliquidAPI instances
+_shared_session: Optional[aiohttp.ClientSession] = None
+_shared_session_lock = asyncio.Lock()
+
+
+async def get_shared_session() -> aiohttp.ClientSession:
+    """Return the process-wide Hyperliquid session, creating it on first use"""
+    global _shared_session
+    async with _shared_session_lock:
+        if _shared_session is None or _shared_session.closed:
+            _shared_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=config.MAX_CONCURRENT_REQUESTS * 4,
+                    limit_per_host=config.MAX_CONCURRENT_REQUESTS * 2,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=10),
+            )
+        return _shared_session
+
+
+@dataclass(slots=True)
 class Position:
     """Represents a trading position"""
     wallet: str
@@ -33,7 +59,7 @@ class Position:
         return "long" if self.is_long else "short"
 
 
-@dataclass 
+@dataclass(slots=True)
 class AssetInfo:
     """Asset metadata"""
     name: str
@@ -49,36 +75,43 @@ class HyperliquidAPI:
     
     def __init__(self):
         self.session: Optional[aiohttp.ClientSession] = None
-        self._rate_limiter = asyncio.Semaphore(config.API_REQUESTS_PER_SECOND)
-        self._last_request_time = 0
+        # Token bucket: bursts up to API_REQUESTS_PER_SECOND, then paced at that rate
+        self._rate_limiter = AsyncLimiter(config.API_REQUESTS_PER_SECOND)
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self.session = await get_shared_session()
         return self
     
     async def __aexit__(self, *args):
-        if self.session:
-            await self.session.close()
+        # The pooled session outlives the instance, see aclose_shared()
+        self.session = None
+    
+    @staticmethod
+    async def aclose_shared():
+        """Close the process-wide HTTP session (call once on shutdown)"""
+        global _shared_session
+        async with _shared_session_lock:
+            if _shared_session is not None:
+                await _shared_session.close()
+                _shared_session = None
             
     async def _request(self, data: Dict) -> Any:
         """Make rate-limited API request"""
-        async with self._rate_limiter:
-            # Ensure minimum delay between requests
-            elapsed = time.time() - self._last_request_time
-            if elapsed < 0.1:  # 100ms minimum between requests
-                await asyncio.sleep(0.1 - elapsed)
-            
-            async with self.session.post(
-                f"{config.API_URL}/info",
-                json=data,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                self._last_request_time = time.time()
-                if response.status == 200:
-                    return await response.json()
-                else:
-                    text = await response.text()
-                    raise Exception(f"API error {response.status}: {text}")
+        return orjson.loads(await self._request_raw(data))
+    
+    async def _request_raw(self, data: Dict) -> bytes:
+        """Make rate-limited API request, returning the undecoded body"""
+        await self._rate_limiter.acquire()
+        async with self.session.post(
+            f"{config.API_URL}/info",
+            data=orjson.dumps(data),
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status == 200:
+                return await response.read()
+            else:
+                text = await response.text()
+                raise Exception(f"API error {response.status}: {text}")
     
     async def get_meta(self) -> Dict:
         """Get exchange metadata (assets, leverage limits, etc.)"""
@@ -103,7 +136,12 @@ class HyperliquidAPI:
     async def get_user_positions(self, wallet: str) -> List[Position]:
         """Get parsed positions for a wallet"""
         try:
-            state = await self.get_clearinghouse_state(wallet)
+            raw = await self._request_raw({"type": "clearinghouseState", "user": wallet})
+            # Most scanned wallets are flat; skip decoding their margin summaries
+            if EMPTY_POSITIONS_MARKER in raw:
+                return []
+            
+            state = orjson.loads(raw)
             positions = []
             
             for asset_pos in state.get("assetPositions", []):
@@ -144,6 +182,26 @@ class HyperliquidAPI:
             # Wallet might not exist or have no positions
             return []
     
+    async def iter_user_positions(self, wallets: List[str]) -> AsyncIterator[Tuple[str, List[Position]]]:
+        """
+        Yield (wallet, positions) for many wallets as each lookup completes.
+        
+        At most config.MAX_CONCURRENT_REQUESTS wallets are in flight at once;
+        the request rate is capped by the token bucket in _request. Wallets
+        that fail yield [].
+        """
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+        
+        async def fetch_one(wallet: str) -> Tuple[str, List[Position]]:
+            async with semaphore:
+                try:
+                    return wallet, await self.get_user_positions(wallet)
+                except Exception:
+                    return wallet, []
+        
+        for next_done in asyncio.as_completed([fetch_one(w) for w in wallets]):
+            yield await next_done
+    
     async def get_recent_trades(self, coin: str, limit: int = 100) -> List[Dict]:
         """Get recent trades for an asset"""
         return await self._request({
@@ -154,41 +212,37 @@ class HyperliquidAPI:
     async def get_asset_info(self) -> Dict[str, AssetInfo]:
         """Get current state of all assets"""
         meta, contexts = await self.get_meta_and_asset_ctxs()
-        universe = meta.get("universe", [])
         
-        assets = {}
-        for i, asset_meta in enumerate(universe):
-            if i >= len(contexts):
-                break
-                
-            ctx = contexts[i]
-            name = asset_meta.get("name", "")
-            
-            # Skip delisted assets
-            if asset_meta.get("isDelisted"):
-                continue
-            
-            assets[name] = AssetInfo(
-                name=name,
-                max_leverage=asset_meta.get("maxLeverage", 1),
-                sz_decimals=asset_meta.get("szDecimals", 0),
-                mark_price=float(ctx.get("markPx", 0)),
-                open_interest=float(ctx.get("openInterest", 0)),
-                funding_rate=float(ctx.get("funding", 0))
+        # zip stops at the shorter list; delisted assets are skipped
+        return {
+            m.get("name", ""): AssetInfo(
+                m.get("name", ""),
+                m.get("maxLeverage", 1),
+                m.get("szDecimals", 0),
+                float(ctx.get("markPx", 0)),
+                float(ctx.get("openInterest", 0)),
+                float(ctx.get("funding", 0)),
             )
-        
-        return assets
+            for m, ctx in zip(meta.get("universe", []), contexts)
+            if not m.get("isDelisted")
+        }
 
 
 # Convenience function for one-off requests
-async def get_wallet_positions(wallet: str) -> List[Position]:
+# (pass an open `api` to reuse one instance across a loop)
+async def get_wallet_positions(wallet: str, api: Optional[HyperliquidAPI] = None) -> List[Position]:
     """Get positions for a single wallet"""
+    if api is not None:
+        return await api.get_user_positions(wallet)
     async with HyperliquidAPI() as api:
         return await api.get_user_positions(wallet)
 
 
-async def get_current_prices() -> Dict[str, float]:
+async def get_current_prices(api: Optional[HyperliquidAPI] = None) -> Dict[str, float]:
     """Get current mid prices for all assets"""
-    async with HyperliquidAPI() as api:
+    if api is not None:
         mids = await api.get_all_mids()
-        return {k: float(v) for k, v in mids.items() if not k.startswith("@")}
+    else:
+        async with HyperliquidAPI() as api:
+            mids = await api.get_all_mids()
+    return {k: float(v) for k, v in mids.items() if not k.startswith("@")}
@@ -2,17 +2,22 @@
 Liquidation Aggregator Module
 Aggregates liquidation levels into clusters and builds the liquidation map
 """
-import json
+import orjson
+import os
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from collections import defaultdict
+import logging
 import math
+from operator import itemgetter
 
 from .config import config
 from .position_scanner import LiquidationLevel
 
+logger = logging.getLogger("hl-collector.aggregator")
 
-@dataclass
+
+@dataclass(slots=True)
 class LiquidationCluster:
     """A cluster of liquidation levels at similar prices"""
     coin: str
@@ -27,9 +32,22 @@ class LiquidationCluster:
     @property
     def price_range_percent(self) -> float:
         return ((self.price_high - self.price_low) / self.price_center) * 100
+    
+    def to_dict(self) -> Dict:
+        # Flat fields only, so a literal is much cheaper than dataclasses.asdict's deep copy
+        return {
+            "coin": self.coin,
+            "side": self.side,
+            "price_low": self.price_low,
+            "price_high": self.price_high,
+            "price_center": self.price_center,
+            "total_size_usd": self.total_size_usd,
+            "position_count": self.position_count,
+            "avg_leverage": self.avg_leverage,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class LiquidationMap:
     """Complete liquidation map for an asset"""
     coin: str
@@ -45,12 +63,12 @@ class LiquidationMap:
         return {
             "coin": self.coin,
             "current_price": self.current_price,
-            "long_liquidations": [asdict(c) for c in self.long_liquidations],
-            "short_liquidations": [asdict(c) for c in self.short_liquidations],
+            "long_liquidations": [c.to_dict() for c in self.long_liquidations],
+            "short_liquidations": [c.to_dict() for c in self.short_liquidations],
             "total_long_at_risk_usd": self.total_long_at_risk_usd,
             "total_short_at_risk_usd": self.total_short_at_risk_usd,
-            "nearest_long_cluster": asdict(self.nearest_long_cluster) if self.nearest_long_cluster else None,
-            "nearest_short_cluster": asdict(self.nearest_short_cluster) if self.nearest_short_cluster else None,
+            "nearest_long_cluster": self.nearest_long_cluster.to_dict() if self.nearest_long_cluster else None,
+            "nearest_short_cluster": self.nearest_short_cluster.to_dict() if self.nearest_short_cluster else None,
         }
 
 
@@ -63,23 +81,22 @@ class LiquidationAggregator:
     def __init__(self, bucket_percent: float = None, min_cluster_size: float = None):
         self.bucket_percent = bucket_percent or config.PRICE_BUCKET_PERCENT
         self.min_cluster_size = min_cluster_size or config.MIN_CLUSTER_SIZE_USD
+        # Percent <-> bucket conversion factors, so the per-level math is multiplies only
+        self._bucket_scale = 100.0 / self.bucket_percent
+        self._bucket_fraction = self.bucket_percent / 100.0
         self.liquidation_maps: Dict[str, LiquidationMap] = {}
         
     def _price_to_bucket(self, price: float, reference_price: float) -> int:
         """Convert price to bucket index"""
         if reference_price <= 0:
             return 0
-        # Calculate percentage difference from reference
-        pct_diff = ((price - reference_price) / reference_price) * 100
-        # Convert to bucket index
-        return int(pct_diff / self.bucket_percent)
+        # Percentage difference from reference, in bucket units
+        return int((price - reference_price) * (self._bucket_scale / reference_price))
     
     def _bucket_to_price_range(self, bucket: int, reference_price: float) -> Tuple[float, float]:
         """Convert bucket index back to price range"""
-        pct_low = bucket * self.bucket_percent
-        pct_high = (bucket + 1) * self.bucket_percent
-        price_low = reference_price * (1 + pct_low / 100)
-        price_high = reference_price * (1 + pct_high / 100)
+        price_low = reference_price * (1 + bucket * self._bucket_fraction)
+        price_high = reference_price * (1 + (bucket + 1) * self._bucket_fraction)
         return price_low, price_high
     
     def aggregate_levels(
@@ -106,16 +123,21 @@ class LiquidationAggregator:
         # Separate long and short liquidations
         # Long positions get liquidated when price drops (their liq price is BELOW entry)
         # Short positions get liquidated when price rises (their liq price is ABOVE entry)
-        long_levels = [l for l in levels if l.side == "long"]
-        short_levels = [l for l in levels if l.side == "short"]
+        long_levels: List[LiquidationLevel] = []
+        short_levels: List[LiquidationLevel] = []
+        for level in levels:
+            if level.side == "long":
+                long_levels.append(level)
+            elif level.side == "short":
+                short_levels.append(level)
         
         # Aggregate into buckets
         long_clusters = self._aggregate_to_clusters(long_levels, current_price, "long")
         short_clusters = self._aggregate_to_clusters(short_levels, current_price, "short")
         
-        # Sort by distance from current price
-        long_clusters.sort(key=lambda c: current_price - c.price_center)  # Closest below first
-        short_clusters.sort(key=lambda c: c.price_center - current_price)  # Closest above first
+        # Order by distance from current price; clusters come back sorted by price_center
+        long_clusters.reverse()  # Closest below first
+        # Shorts are already closest above first
         
         # Calculate totals
         total_long = sum(c.total_size_usd for c in long_clusters)
@@ -156,33 +178,39 @@ class LiquidationAggregator:
         if not levels:
             return []
         
-        # Group by bucket
-        buckets: Dict[int, List[LiquidationLevel]] = defaultdict(list)
+        # Reduce each bucket in a single pass to running totals:
+        # [total size, leverage-weighted size, position count, coin]
+        buckets: Dict[int, list] = {}
+        scale = self._bucket_scale / reference_price  # One divide per call, not per level
         for level in levels:
-            bucket = self._price_to_bucket(level.price, reference_price)
-            buckets[bucket].append(level)
+            # Same arithmetic as _price_to_bucket, inlined for the hot loop
+            bucket = int((level.price - reference_price) * scale)
+            acc = buckets.get(bucket)
+            if acc is None:
+                buckets[bucket] = [level.size_usd, level.leverage * level.size_usd, 1, level.coin]
+            else:
+                acc[0] += level.size_usd
+                acc[1] += level.leverage * level.size_usd
+                acc[2] += 1
         
         # Convert buckets to clusters
         clusters = []
-        for bucket, bucket_levels in buckets.items():
-            total_size = sum(l.size_usd for l in bucket_levels)
-            
+        for bucket, (total_size, weighted_leverage, count, coin) in buckets.items():
             # Skip tiny clusters
             if total_size < 10000:  # $10k minimum
                 continue
             
             price_low, price_high = self._bucket_to_price_range(bucket, reference_price)
-            avg_leverage = sum(l.leverage * l.size_usd for l in bucket_levels) / total_size
             
             clusters.append(LiquidationCluster(
-                coin=bucket_levels[0].coin,
+                coin=coin,
                 side=side,
                 price_low=price_low,
                 price_high=price_high,
                 price_center=(price_low + price_high) / 2,
                 total_size_usd=total_size,
-                position_count=len(bucket_levels),
-                avg_leverage=avg_leverage,
+                position_count=count,
+                avg_leverage=weighted_leverage / total_size,
             ))
         
         # Merge adjacent clusters if they're small
@@ -194,7 +222,7 @@ class LiquidationAggregator:
         self, 
         clusters: List[LiquidationCluster]
     ) -> List[LiquidationCluster]:
-        """Merge adjacent small clusters"""
+        """Merge adjacent small clusters, returned sorted by price_center ascending"""
         if len(clusters) < 2:
             return clusters
         
@@ -203,15 +231,16 @@ class LiquidationAggregator:
         
         merged = []
         current = clusters[0]
+        merge_percent = config.CLUSTER_MERGE_PERCENT
+        min_size = self.min_cluster_size
         
-        for next_cluster in clusters[1:]:
-            # Check if clusters should be merged
-            gap_percent = ((next_cluster.price_low - current.price_high) / current.price_center) * 100
-            
+        for i in range(1, len(clusters)):
+            next_cluster = clusters[i]
+            # Check if clusters should be merged (size tests first, they skip the gap math)
             should_merge = (
-                gap_percent < config.CLUSTER_MERGE_PERCENT and
-                current.total_size_usd < self.min_cluster_size and
-                next_cluster.total_size_usd < self.min_cluster_size
+                current.total_size_usd < min_size and
+                next_cluster.total_size_usd < min_size and
+                ((next_cluster.price_low - current.price_high) / current.price_center) * 100 < merge_percent
             )
             
             if should_merge:
@@ -263,36 +292,27 @@ class LiquidationAggregator:
         Returns potential trade setups.
         """
         signals = []
+        # Thresholds are fixed for the whole call
+        min_size = config.ALERT_CLUSTER_SIZE_USD
         
         for coin, liq_map in self.liquidation_maps.items():
             current_price = prices.get(coin, liq_map.current_price)
             
-            # Check for nearby short liquidation cluster (potential long entry)
-            if liq_map.nearest_short_cluster:
-                cluster = liq_map.nearest_short_cluster
-                distance_pct = ((cluster.price_center - current_price) / current_price) * 100
-                
-                if 0.5 <= distance_pct <= 3.0 and cluster.total_size_usd >= config.ALERT_CLUSTER_SIZE_USD:
-                    signals.append({
-                        "coin": coin,
-                        "signal": "LONG",
-                        "reason": f"Short liquidation cluster ${cluster.total_size_usd/1e6:.1f}M at {cluster.price_center:.2f}",
-                        "target": cluster.price_center,
-                        "distance_percent": distance_pct,
-                        "cluster_size_usd": cluster.total_size_usd,
-                        "current_price": current_price,
-                    })
-            
-            # Check for nearby long liquidation cluster (potential short entry)
-            if liq_map.nearest_long_cluster:
-                cluster = liq_map.nearest_long_cluster
-                distance_pct = ((current_price - cluster.price_center) / current_price) * 100
+            # Nearby short liquidation cluster above = potential long entry,
+            # nearby long liquidation cluster below = potential short entry
+            for cluster, direction in (
+                (liq_map.nearest_short_cluster, 1),
+                (liq_map.nearest_long_cluster, -1),
+            ):
+                if cluster is None or cluster.total_size_usd < min_size:
+                    continue
                 
-                if 0.5 <= distance_pct <= 3.0 and cluster.total_size_usd >= config.ALERT_CLUSTER_SIZE_USD:
+                distance_pct = direction * ((cluster.price_center - current_price) / current_price) * 100
+                if 0.5 <= distance_pct <= 3.0:
                     signals.append({
                         "coin": coin,
-                        "signal": "SHORT",
-                        "reason": f"Long liquidation cluster ${cluster.total_size_usd/1e6:.1f}M at {cluster.price_center:.2f}",
+                        "signal": "LONG" if direction > 0 else "SHORT",
+                        "reason": f"{cluster.side.capitalize()} liquidation cluster ${cluster.total_size_usd/1e6:.1f}M at {cluster.price_center:.2f}",
                         "target": cluster.price_center,
                         "distance_percent": distance_pct,
                         "cluster_size_usd": cluster.total_size_usd,
@@ -300,7 +320,7 @@ class LiquidationAggregator:
                     })
         
         # Sort by cluster size (bigger = more significant)
-        signals.sort(key=lambda s: s["cluster_size_usd"], reverse=True)
+        signals.sort(key=itemgetter("cluster_size_usd"), reverse=True)
         
         return signals
     
@@ -308,15 +328,14 @@ class LiquidationAggregator:
         """Save liquidation maps to file"""
         filepath = filepath or config.LIQUIDATION_MAP_FILE
         
-        data = {
-            coin: liq_map.to_dict() 
-            for coin, liq_map in self.liquidation_maps.items()
-        }
-        
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+        # orjson serializes the dataclasses natively (same layout as to_dict), and
+        # the temp file + rename means readers never see a half-written map
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(self.liquidation_maps, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, filepath)
         
-        print(f"[LiquidationAggregator] Saved maps for {len(data)} coins to {filepath}")
+        logger.info("Saved maps for %d coins to %s", len(self.liquidation_maps), filepath)
     
     def print_summary(self):
         """Print a summary of liquidation maps"""
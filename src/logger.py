@@ -5,13 +5,19 @@ Provides structured logging for all modules with:
 - Console output with colors
 - File logging with rotation
 - Configurable log levels
+- Handler I/O on a background thread, so logging never blocks the event loop
 """
 
+import atexit
 import logging
+import queue
 import sys
 from pathlib import Path
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Listeners started by setup_logger, keyed by logger name
+_listeners: dict = {}
 
 
 def setup_logger(
@@ -55,24 +61,42 @@ def setup_logger(
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
     
-    # File handler with rotation
+    # File handler with rotation (the file is only opened on the first record)
     log_file = Path(log_dir) / f"{name}.log"
     file_handler = RotatingFileHandler(
         log_file,
         maxBytes=max_bytes,
-        backupCount=backup_count
+        backupCount=backup_count,
+        delay=True
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    
+    # The logger only enqueues records; a listener thread does the console and file writes
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
     
     return logger
 
 
-# Create default logger
-logger = setup_logger()
+def stop_loggers():
+    """Stop the listener threads started by setup_logger, writing out queued records"""
+    while _listeners:
+        name, listener = _listeners.popitem()
+        listener.stop()
+        # Drop the queue handler so a later setup_logger() starts a fresh listener
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            if isinstance(handler, QueueHandler):
+                logger.removeHandler(handler)
+
+
+# Safety net for entrypoints that exit without calling stop_loggers()
+atexit.register(stop_loggers)
 
 
 def get_logger(module_name: str) -> logging.Logger:
@@ -3,22 +3,29 @@ Market Data Module
 Fetches open interest, volume, funding rates, and order book liquidity from Hyperliquid
 """
 import asyncio
+import heapq
 import aiohttp
+import orjson
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 
 from .config import config
+from .hyperliquid_api import get_shared_session
+from .rate_limit import AsyncLimiter
 
+# Hourly funding rate -> annualized percent
+FUNDING_ANNUALIZED_PCT = 24 * 365 * 100
 
-@dataclass
+
+@dataclass(slots=True)
 class OrderBookLevel:
     price: float
     size: float
     num_orders: int
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderBookLiquidity:
     """Liquidity metrics from order book"""
     coin: str
@@ -59,7 +66,7 @@ class OrderBookLiquidity:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class AssetMarketData:
     """Market data for a single asset"""
     coin: str
@@ -112,34 +119,95 @@ class AssetMarketData:
         return result
 
 
+def _depth_bands(levels: List[Dict], mid: float, is_bid: bool) -> Tuple[float, float, float]:
+    """
+    Cumulative USD depth within 0.5%, 1% and 2% of mid, from raw l2Book levels.
+    
+    One pass feeds all three sums. Levels arrive best-first, so the scan stops
+    at the first one beyond the 2% threshold, and deeper levels are never parsed.
+    """
+    if is_bid:
+        t0_5, t1, t2 = mid * (1 - 0.5/100), mid * (1 - 1.0/100), mid * (1 - 2.0/100)
+    else:
+        t0_5, t1, t2 = mid * (1 + 0.5/100), mid * (1 + 1.0/100), mid * (1 + 2.0/100)
+    
+    d0_5 = d1 = d2 = 0
+    for level in levels:
+        price = float(level['px'])
+        if (price < t2) if is_bid else (price > t2):
+            break
+        notional = float(level['sz']) * price
+        d2 += notional
+        if (price >= t1) if is_bid else (price <= t1):
+            d1 += notional
+            if (price >= t0_5) if is_bid else (price <= t0_5):
+                d0_5 += notional
+    return d0_5, d1, d2
+
+
 class MarketDataFetcher:
     """Fetches market data from Hyperliquid"""
     
     def __init__(self):
         self.base_url = config.API_URL
         self._session: Optional[aiohttp.ClientSession] = None
-        self._asset_index_map: Dict[str, int] = {}
+        self._rate_limiter = AsyncLimiter(config.API_REQUESTS_PER_SECOND)
     
     async def __aenter__(self):
-        self._session = aiohttp.ClientSession()
+        # Same host as HyperliquidAPI, so borrow its pooled keep-alive session
+        self._session = await get_shared_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self._session:
-            await self._session.close()
+        # The pooled session outlives the fetcher, see HyperliquidAPI.aclose_shared()
+        self._session = None
     
     async def _post(self, payload: Dict) -> Dict:
         """Make POST request to Hyperliquid API"""
         async with self._session.post(
             f"{self.base_url}/info",
-            json=payload,
+            data=orjson.dumps(payload),
             headers={"Content-Type": "application/json"}
         ) as response:
-            return await response.json()
+            return orjson.loads(await response.read())
     
-    async def fetch_all_market_data(self, include_liquidity: bool = False) -> Dict[str, AssetMarketData]:
-        """Fetch market data for all assets"""
-        timestamp = datetime.utcnow()
+    @staticmethod
+    def _parse_asset_ctx(ctx: Dict) -> Dict:
+        """Numeric AssetMarketData fields for one asset context, in to_dict order"""
+        get = ctx.get
+        mark_price = float(get('markPx', 0))
+        open_interest = float(get('openInterest', 0))
+        funding_rate = float(get('funding', 0))
+        prev_day_price = float(get('prevDayPx', 0))
+        
+        price_change_24h_pct = 0
+        if prev_day_price > 0:
+            price_change_24h_pct = ((mark_price - prev_day_price) / prev_day_price) * 100
+        
+        return {
+            'mark_price': mark_price,
+            'oracle_price': float(get('oraclePx', 0)),
+            'mid_price': float(get('midPx', 0)),
+            'open_interest': open_interest,
+            'open_interest_usd': open_interest * mark_price,
+            'volume_24h_usd': float(get('dayNtlVlm', 0)),
+            'volume_24h_base': float(get('dayBaseVlm', 0)),
+            'funding_rate': funding_rate,
+            'funding_rate_annualized': funding_rate * FUNDING_ANNUALIZED_PCT,
+            'premium': float(get('premium', 0)),
+            'prev_day_price': prev_day_price,
+            'price_change_24h_pct': price_change_24h_pct,
+        }
+    
+    async def fetch_all_market_data(self, include_liquidity: bool = False, raw_dicts: bool = False) -> Dict:
+        """
+        Fetch market data for all assets.
+        
+        With raw_dicts=True the values are plain dicts in AssetMarketData.to_dict()
+        layout, skipping the dataclass for callers that only serialize.
+        """
+        timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+        timestamp_iso = timestamp.isoformat()
         
         # Fetch meta and asset contexts
         data = await self._post({"type": "metaAndAssetCtxs"})
@@ -151,78 +219,53 @@ class MarketDataFetcher:
         asset_ctxs = data[1]
         universe = meta.get('universe', [])
         
-        # Build index map
-        self._asset_index_map = {
-            asset['name']: idx for idx, asset in enumerate(universe)
-        }
-        
         results = {}
+        oi_usd: Dict[str, float] = {}
         
-        for idx, ctx in enumerate(asset_ctxs):
-            if idx >= len(universe):
-                break
-            
-            coin = universe[idx]['name']
+        for asset, ctx in zip(universe, asset_ctxs):
+            coin = asset['name']
             
             try:
-                mark_price = float(ctx.get('markPx', 0))
-                oracle_price = float(ctx.get('oraclePx', 0))
-                mid_price = float(ctx.get('midPx', 0))
-                open_interest = float(ctx.get('openInterest', 0))
-                volume_24h_usd = float(ctx.get('dayNtlVlm', 0))
-                volume_24h_base = float(ctx.get('dayBaseVlm', 0))
-                funding_rate = float(ctx.get('funding', 0))
-                premium = float(ctx.get('premium', 0))
-                prev_day_price = float(ctx.get('prevDayPx', 0))
-                
-                # Calculate derived metrics
-                open_interest_usd = open_interest * mark_price
-                funding_rate_annualized = funding_rate * 24 * 365 * 100  # Convert to annual %
-                
-                price_change_24h_pct = 0
-                if prev_day_price > 0:
-                    price_change_24h_pct = ((mark_price - prev_day_price) / prev_day_price) * 100
-                
-                results[coin] = AssetMarketData(
-                    coin=coin,
-                    timestamp=timestamp,
-                    mark_price=mark_price,
-                    oracle_price=oracle_price,
-                    mid_price=mid_price,
-                    open_interest=open_interest,
-                    open_interest_usd=open_interest_usd,
-                    volume_24h_usd=volume_24h_usd,
-                    volume_24h_base=volume_24h_base,
-                    funding_rate=funding_rate,
-                    funding_rate_annualized=funding_rate_annualized,
-                    premium=premium,
-                    prev_day_price=prev_day_price,
-                    price_change_24h_pct=price_change_24h_pct,
-                )
+                fields = self._parse_asset_ctx(ctx)
             except (ValueError, TypeError) as e:
                 continue
+            
+            oi_usd[coin] = fields['open_interest_usd']
+            if raw_dicts:
+                results[coin] = {'coin': coin, 'timestamp': timestamp_iso, **fields}
+            else:
+                results[coin] = AssetMarketData(coin=coin, timestamp=timestamp, **fields)
         
         # Optionally fetch liquidity for top assets
         if include_liquidity:
-            top_coins = sorted(
-                results.keys(),
-                key=lambda c: results[c].open_interest_usd,
-                reverse=True
-            )[:20]  # Top 20 by OI
+            top_coins = heapq.nlargest(20, oi_usd, key=oi_usd.__getitem__)  # Top 20 by OI
             
-            liquidity_data = await self.fetch_liquidity_batch(top_coins)
+            liquidity_data = await self.fetch_liquidity_batch(top_coins, timestamp)
             for coin, liquidity in liquidity_data.items():
                 if coin in results:
-                    results[coin].liquidity = liquidity
+                    if raw_dicts:
+                        results[coin]['liquidity'] = liquidity.to_dict()
+                    else:
+                        results[coin].liquidity = liquidity
         
         return results
     
-    async def fetch_order_book(self, coin: str) -> Optional[Tuple[List[OrderBookLevel], List[OrderBookLevel]]]:
-        """Fetch order book for a single coin"""
+    async def _fetch_raw_levels(self, coin: str) -> Optional[Tuple[List[Dict], List[Dict]]]:
+        """Fetch the undecoded {px, sz, n} bid and ask levels for a coin"""
         try:
             data = await self._post({"type": "l2Book", "coin": coin})
             levels = data.get('levels', [[], []])
-            
+            return levels[0], levels[1]
+        except Exception as e:
+            return None
+    
+    async def fetch_order_book(self, coin: str) -> Optional[Tuple[List[OrderBookLevel], List[OrderBookLevel]]]:
+        """Fetch order book for a single coin"""
+        levels = await self._fetch_raw_levels(coin)
+        if levels is None:
+            return None
+        
+        try:
             bids = []
             for level in levels[0]:
                 bids.append(OrderBookLevel(
@@ -243,9 +286,12 @@ class MarketDataFetcher:
         except Exception as e:
             return None
     
-    async def fetch_liquidity(self, coin: str, mark_price: float = None) -> Optional[OrderBookLiquidity]:
-        """Calculate liquidity metrics for a coin"""
-        book = await self.fetch_order_book(coin)
+    async def fetch_liquidity(
+        self, coin: str, mark_price: float = None, timestamp: datetime = None
+    ) -> Optional[OrderBookLiquidity]:
+        """Calculate liquidity metrics for a coin (timestamp defaults to now)"""
+        # Raw levels: only the best price and the levels inside 2% get parsed
+        book = await self._fetch_raw_levels(coin)
         if not book:
             return None
         
@@ -253,9 +299,10 @@ class MarketDataFetcher:
         if not bids or not asks:
             return None
         
-        timestamp = datetime.utcnow()
-        best_bid = bids[0].price
-        best_ask = asks[0].price
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+        best_bid = float(bids[0]['px'])
+        best_ask = float(asks[0]['px'])
         mid_price = (best_bid + best_ask) / 2
         
         if mark_price:
@@ -264,25 +311,8 @@ class MarketDataFetcher:
         spread_percent = ((best_ask - best_bid) / mid_price) * 100
         
         # Calculate depth at various levels
-        def calc_depth(levels: List[OrderBookLevel], mid: float, pct: float, is_bid: bool) -> float:
-            """Calculate cumulative depth within pct% of mid price"""
-            total = 0
-            threshold = mid * (1 - pct/100) if is_bid else mid * (1 + pct/100)
-            
-            for level in levels:
-                if is_bid and level.price >= threshold:
-                    total += level.size * level.price
-                elif not is_bid and level.price <= threshold:
-                    total += level.size * level.price
-            
-            return total
-        
-        bid_0_5 = calc_depth(bids, mid_price, 0.5, True)
-        ask_0_5 = calc_depth(asks, mid_price, 0.5, False)
-        bid_1 = calc_depth(bids, mid_price, 1.0, True)
-        ask_1 = calc_depth(asks, mid_price, 1.0, False)
-        bid_2 = calc_depth(bids, mid_price, 2.0, True)
-        ask_2 = calc_depth(asks, mid_price, 2.0, False)
+        bid_0_5, bid_1, bid_2 = _depth_bands(bids, mid_price, True)
+        ask_0_5, ask_1, ask_2 = _depth_bands(asks, mid_price, False)
         
         # Imbalance: positive = more bids (bullish), negative = more asks (bearish)
         imbalance_0_5 = 0
@@ -309,31 +339,35 @@ class MarketDataFetcher:
             imbalance_1_pct=imbalance_1,
         )
     
-    async def fetch_liquidity_batch(self, coins: List[str]) -> Dict[str, OrderBookLiquidity]:
-        """Fetch liquidity for multiple coins"""
-        results = {}
+    async def fetch_liquidity_batch(
+        self, coins: List[str], timestamp: datetime = None
+    ) -> Dict[str, OrderBookLiquidity]:
+        """Fetch liquidity for multiple coins concurrently, stamped with one shared timestamp"""
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
         
-        for coin in coins:
-            liquidity = await self.fetch_liquidity(coin)
-            if liquidity:
-                results[coin] = liquidity
-            await asyncio.sleep(0.1)  # Rate limiting
+        async def fetch_one(coin: str) -> Optional[OrderBookLiquidity]:
+            async with semaphore:
+                await self._rate_limiter.acquire()
+                return await self.fetch_liquidity(coin, timestamp=timestamp)
         
-        return results
+        liquidity = await asyncio.gather(*(fetch_one(c) for c in coins), return_exceptions=True)
+        return {
+            coin: result
+            for coin, result in zip(coins, liquidity)
+            if result and not isinstance(result, Exception)
+        }
 
 
-async def get_market_data(include_liquidity: bool = False) -> Dict[str, AssetMarketData]:
+async def get_market_data(include_liquidity: bool = False, raw_dicts: bool = False) -> Dict:
     """Convenience function to fetch all market data"""
     async with MarketDataFetcher() as fetcher:
-        return await fetcher.fetch_all_market_data(include_liquidity)
+        return await fetcher.fetch_all_market_data(include_liquidity, raw_dicts)
 
 
 async def get_top_oi_assets(limit: int = 20) -> List[Tuple[str, float]]:
     """Get top assets by open interest"""
     data = await get_market_data()
-    sorted_assets = sorted(
-        data.items(),
-        key=lambda x: x[1].open_interest_usd,
-        reverse=True
-    )
-    return [(coin, d.open_interest_usd) for coin, d in sorted_assets[:limit]]
+    top_assets = heapq.nlargest(limit, data.items(), key=lambda x: x[1].open_interest_usd)
+    return [(coin, d.open_interest_usd) for coin, d in top_assets]
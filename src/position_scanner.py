@@ -3,17 +3,21 @@ Position Scanner Module
 Scans wallets to collect position data and liquidation levels
 """
 import asyncio
-import json
+import logging
+import orjson
+import time
 from typing import Dict, List, Set, Optional
 from datetime import datetime
 from collections import defaultdict
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 
 from .config import config
 from .hyperliquid_api import HyperliquidAPI, Position
 
+logger = logging.getLogger("hl-collector.scanner")
 
-@dataclass
+
+@dataclass(slots=True)
 class LiquidationLevel:
     """A single liquidation level"""
     price: float
@@ -79,7 +83,7 @@ class PositionScanner:
         Returns aggregated position data and liquidation levels.
         """
         async with self._scan_lock:
-            start_time = datetime.now()
+            start_time = time.monotonic()
             
             all_positions: List[Position] = []
             positions_by_coin: Dict[str, List[Position]] = defaultdict(list)
@@ -92,52 +96,50 @@ class PositionScanner:
             
             print(f"[PositionScanner] Scanning {total} wallets...")
             
-            # Scan in batches to respect rate limits
-            batch_size = config.API_REQUESTS_PER_SECOND
-            for i in range(0, total, batch_size):
-                batch = wallet_list[i:i + batch_size]
-                
-                # Create tasks for batch
-                tasks = [self.scan_wallet(w) for w in batch]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                for wallet, result in zip(batch, results):
-                    if isinstance(result, Exception):
-                        errors += 1
+            # Wallets are fetched continuously (bounded by MAX_CONCURRENT_REQUESTS and
+            # paced by the token bucket in HyperliquidAPI) and handled as they complete
+            scanned = 0
+            last_report = start_time
+            callback_every = config.API_REQUESTS_PER_SECOND  # The old batch size, callers expect this cadence
+            total_long = total_short = 0.0
+            min_value = config.MIN_POSITION_VALUE_USD
+            async for wallet, result in self.api.iter_user_positions(wallet_list):
+                scanned += 1
+                for position in result:
+                    # Filter small positions
+                    notional = position.notional_value
+                    if notional < min_value:
                         continue
                     
-                    for position in result:
-                        # Filter small positions
-                        if position.notional_value < config.MIN_POSITION_VALUE_USD:
-                            continue
-                        
-                        all_positions.append(position)
-                        positions_by_coin[position.coin].append(position)
-                        
-                        # Extract liquidation level if available
-                        if position.liquidation_price is not None:
-                            liquidation_levels.append(LiquidationLevel(
-                                price=position.liquidation_price,
-                                size_usd=position.notional_value,
-                                side=position.side,
-                                wallet=position.wallet,
-                                coin=position.coin,
-                                leverage=position.leverage
-                            ))
+                    all_positions.append(position)
+                    positions_by_coin[position.coin].append(position)
+                    is_long = position.size > 0  # Same test as Position.is_long, without the property call
+                    if is_long:
+                        total_long += notional
+                    else:
+                        total_short += notional
+                    
+                    # Extract liquidation level if available
+                    if position.liquidation_price is not None:
+                        liquidation_levels.append(LiquidationLevel(
+                            position.liquidation_price,
+                            notional,
+                            "long" if is_long else "short",
+                            position.wallet,
+                            position.coin,
+                            position.leverage,
+                        ))
                 
-                # Progress update
-                scanned = min(i + batch_size, total)
+                # Progress: callback every API_REQUESTS_PER_SECOND wallets, otherwise
+                # log at most once a second (the totals are printed after the scan)
                 if progress_callback:
-                    progress_callback(scanned, total)
-                elif scanned % 100 == 0 or scanned == total:
-                    print(f"  Progress: {scanned}/{total} wallets ({len(all_positions)} positions)")
-                
-                # Small delay between batches
-                await asyncio.sleep(0.1)
-            
-            # Calculate totals
-            total_long = sum(p.notional_value for p in all_positions if p.is_long)
-            total_short = sum(p.notional_value for p in all_positions if not p.is_long)
+                    if scanned % callback_every == 0 or scanned == total:
+                        progress_callback(scanned, total)
+                else:
+                    now = time.monotonic()
+                    if now - last_report >= 1.0:
+                        last_report = now
+                        logger.info("Progress: %d/%d wallets (%d positions)", scanned, total, len(all_positions))
             
             # Create result
             result = ScanResult(
@@ -156,7 +158,7 @@ class PositionScanner:
             self.positions_cache = dict(positions_by_coin)
             self.liquidation_levels = liquidation_levels
             
-            duration = (datetime.now() - start_time).total_seconds()
+            duration = time.monotonic() - start_time
             print(f"[PositionScanner] Scan complete in {duration:.1f}s")
             print(f"  Positions: {len(all_positions)}")
             print(f"  Long exposure: ${total_long:,.0f}")
@@ -190,11 +192,12 @@ class PositionScanner:
                 "long_exposure_usd": self.last_scan_result.total_long_exposure_usd,
                 "short_exposure_usd": self.last_scan_result.total_short_exposure_usd,
             },
-            "liquidation_levels": [asdict(l) for l in self.liquidation_levels],
+            # orjson serializes the slotted dataclasses directly, same fields as asdict()
+            "liquidation_levels": self.liquidation_levels,
         }
         
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
         
         print(f"[PositionScanner] Saved to {filepath}")
     
@@ -203,8 +206,8 @@ class PositionScanner:
         filepath = filepath or config.POSITIONS_CACHE_FILE
         
         try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
+            with open(filepath, "rb") as f:
+                data = orjson.loads(f.read())
             
             self.liquidation_levels = [
                 LiquidationLevel(**l) for l in data.get("liquidation_levels", [])
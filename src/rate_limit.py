@@ -0,0 +1,55 @@
+"""
+Async Token-Bucket Rate Limiter
+
+Lets requests run fully concurrent while capping their start rate, instead of
+fixed batches separated by sleeps.
+
+Usage:
+    limiter = AsyncLimiter(10, time_period=1.0)  # 10 requests per second
+    async with limiter:
+        await client.get(...)
+"""
+
+import asyncio
+import time
+
+
+class AsyncLimiter:
+    """
+    Token bucket allowing max_rate acquisitions per time_period.
+
+    The bucket starts full, so up to max_rate requests go out immediately;
+    after that tokens refill continuously at max_rate / time_period.
+    """
+
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        if max_rate <= 0 or time_period <= 0:
+            raise ValueError("max_rate and time_period must be positive")
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._rate_per_sec = max_rate / time_period
+        self._tokens = float(max_rate)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._last_refill) * self._rate_per_sec)
+        self._last_refill = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        # The lock queues waiters in arrival order, so the first caller in is served first
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate_per_sec)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args):
+        pass
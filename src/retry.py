@@ -6,7 +6,8 @@ Provides decorators and utilities for resilient API calls.
 
 import asyncio
 import functools
-from typing import Type, Tuple, Callable, Any
+import random
+from typing import Type, Tuple, Callable, Any, Optional
 import logging
 
 logger = logging.getLogger("hl-collector.retry")
@@ -19,12 +20,29 @@ RETRYABLE_EXCEPTIONS: Tuple[Type[Exception], ...] = (
 )
 
 
+def _sleep_for(error: Exception, delay: float, max_delay: float, jitter: bool) -> float:
+    """
+    Seconds to wait before the next attempt.
+    
+    A RateLimitError carrying retry_after is honoured (capped at max_delay);
+    otherwise the backoff delay is randomized to 50-150% so clients that failed
+    together don't retry in lockstep.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after:
+        return min(retry_after, max_delay)
+    if jitter:
+        return delay * (0.5 + random.random())
+    return delay
+
+
 def retry_async(
     max_attempts: int = 3,
     initial_delay: float = 1.0,
     max_delay: float = 30.0,
     exponential_base: float = 2.0,
     exceptions: Tuple[Type[Exception], ...] = RETRYABLE_EXCEPTIONS,
+    jitter: bool = True,
 ):
     """
     Decorator for async functions with exponential backoff retry
@@ -35,6 +53,7 @@ def retry_async(
         max_delay: Maximum delay between retries (seconds)
         exponential_base: Base for exponential backoff
         exceptions: Tuple of exception types to retry on
+        jitter: Randomize each delay to 50-150% of the backoff value
         
     Example:
         @retry_async(max_attempts=3)
@@ -42,34 +61,37 @@ def retry_async(
             ...
     """
     def decorator(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def wrapper(*args, **kwargs) -> Any:
-            last_exception = None
+        name = func.__name__
+        
+        async def retry(error: Exception, args, kwargs) -> Any:
+            """Attempts 2..max_attempts, only entered once the first call has failed"""
             delay = initial_delay
             
-            for attempt in range(1, max_attempts + 1):
+            for attempt in range(1, max_attempts):
+                sleep_for = _sleep_for(error, delay, max_delay, jitter)
+                logger.warning(
+                    "%s attempt %d/%d failed: %s. Retrying in %.1fs...",
+                    name, attempt, max_attempts, error, sleep_for
+                )
+                
+                await asyncio.sleep(sleep_for)
+                delay = min(delay * exponential_base, max_delay)
+                
                 try:
                     return await func(*args, **kwargs)
                 except exceptions as e:
-                    last_exception = e
-                    
-                    if attempt == max_attempts:
-                        logger.error(
-                            f"{func.__name__} failed after {max_attempts} attempts: {e}"
-                        )
-                        raise
-                    
-                    logger.warning(
-                        f"{func.__name__} attempt {attempt}/{max_attempts} failed: {e}. "
-                        f"Retrying in {delay:.1f}s..."
-                    )
-                    
-                    await asyncio.sleep(delay)
-                    delay = min(delay * exponential_base, max_delay)
+                    error = e
             
-            # Should never reach here, but just in case
-            if last_exception:
-                raise last_exception
+            logger.error("%s failed after %d attempts: %s", name, max_attempts, error)
+            raise error
+        
+        # The success path is a single try with no loop or backoff state
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            try:
+                return await func(*args, **kwargs)
+            except exceptions as e:
+                return await retry(e, args, kwargs)
                 
         return wrapper
     return decorator
@@ -81,6 +103,7 @@ def retry_sync(
     max_delay: float = 30.0,
     exponential_base: float = 2.0,
     exceptions: Tuple[Type[Exception], ...] = RETRYABLE_EXCEPTIONS,
+    jitter: bool = True,
 ):
     """
     Decorator for sync functions with exponential backoff retry
@@ -105,12 +128,13 @@ def retry_sync(
                         )
                         raise
                     
+                    sleep_for = _sleep_for(e, delay, max_delay, jitter)
                     logger.warning(
                         f"{func.__name__} attempt {attempt}/{max_attempts} failed: {e}. "
-                        f"Retrying in {delay:.1f}s..."
+                        f"Retrying in {sleep_for:.1f}s..."
                     )
                     
-                    time.sleep(delay)
+                    time.sleep(sleep_for)
                     delay = min(delay * exponential_base, max_delay)
             
             if last_exception:
@@ -133,8 +157,10 @@ class APIError(RetryableError):
 
 
 class RateLimitError(RetryableError):
-    """Rate limit exceeded"""
-    pass
+    """Rate limit exceeded, optionally with the server's Retry-After (seconds)"""
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(message)
 
 
 class DataValidationError(Exception):
@@ -6,23 +6,27 @@ anomalies and corrupted data before it affects trading decisions.
 """
 
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Optional, Tuple
 from dataclasses import dataclass
 
 logger = logging.getLogger("hl-collector.validation")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ValidationResult:
-    """Result of data validation"""
+    """Result of data validation (immutable, since clean results are shared)"""
     is_valid: bool
-    warnings: List[str]
-    errors: List[str]
+    warnings: Tuple[str, ...]
+    errors: Tuple[str, ...]
     
     def __bool__(self):
         return self.is_valid
 
 
+# Shared result for the common clean case, so passing checks allocate nothing
+_VALID_OK = ValidationResult(True, (), ())
+
+
 class DataValidator:
     """
     Validates liquidation and market data for sanity
@@ -63,19 +67,20 @@ class DataValidator:
     
     def validate_price(self, coin: str, price: float) -> ValidationResult:
         """Validate a price value"""
+        if price is None:
+            return ValidationResult(False, (), (f"{coin}: Price is None",))
+        
+        # Fast path: in-bounds prices (bounds are all positive) need no messages
+        min_price, max_price = self.PRICE_BOUNDS.get(coin, self.DEFAULT_PRICE_BOUNDS)
+        if min_price <= price <= max_price:
+            return _VALID_OK
+        
         errors = []
         warnings = []
         
-        if price is None:
-            errors.append(f"{coin}: Price is None")
-            return ValidationResult(False, warnings, errors)
-        
         if price <= 0:
             errors.append(f"{coin}: Invalid price {price} (must be positive)")
-            return ValidationResult(False, warnings, errors)
-        
-        bounds = self.PRICE_BOUNDS.get(coin, self.DEFAULT_PRICE_BOUNDS)
-        min_price, max_price = bounds
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         if price < min_price:
             warnings.append(f"{coin}: Price ${price:,.4f} below expected minimum ${min_price:,.4f}")
@@ -83,7 +88,7 @@ class DataValidator:
         if price > max_price:
             warnings.append(f"{coin}: Price ${price:,.4f} above expected maximum ${max_price:,.4f}")
         
-        return ValidationResult(True, warnings, errors)
+        return ValidationResult(True, tuple(warnings), tuple(errors))
     
     def validate_liquidation_cluster(
         self,
@@ -93,6 +98,15 @@ class DataValidator:
         current_price: float
     ) -> ValidationResult:
         """Validate a liquidation cluster"""
+        distance_pct = abs(price_level - current_price) / current_price * 100 if current_price > 0 else 0.0
+        
+        # Fast path: one combined bounds check, messages are only built on failure
+        if (
+            self.MIN_CLUSTER_SIZE_USD <= size_usd <= self.MAX_CLUSTER_SIZE_USD
+            and distance_pct <= 50
+        ):
+            return _VALID_OK
+        
         errors = []
         warnings = []
         
@@ -106,12 +120,10 @@ class DataValidator:
             errors.append(
                 f"{coin}: Cluster size ${size_usd:,.0f} exceeds maximum ${self.MAX_CLUSTER_SIZE_USD:,.0f}"
             )
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         # Check price level relative to current price
         if current_price > 0:
-            distance_pct = abs(price_level - current_price) / current_price * 100
-            
             if distance_pct > 50:
                 warnings.append(
                     f"{coin}: Cluster at ${price_level:,.2f} is {distance_pct:.1f}% from current price"
@@ -121,9 +133,11 @@ class DataValidator:
                 errors.append(
                     f"{coin}: Cluster at ${price_level:,.2f} is unrealistically far ({distance_pct:.1f}%) from current"
                 )
-                return ValidationResult(False, warnings, errors)
+                return ValidationResult(False, tuple(warnings), tuple(errors))
         
-        return ValidationResult(len(errors) == 0, warnings, errors)
+        if not errors and not warnings:
+            return _VALID_OK
+        return ValidationResult(len(errors) == 0, tuple(warnings), tuple(errors))
     
     def validate_position(
         self,
@@ -135,6 +149,17 @@ class DataValidator:
         current_price: float
     ) -> ValidationResult:
         """Validate a position"""
+        distance_pct = abs(liquidation_price - current_price) / current_price * 100 if current_price > 0 else None
+        
+        # Fast path: one combined bounds check, messages are only built on failure
+        if (
+            self.MIN_POSITION_SIZE_USD <= size_usd <= self.MAX_POSITION_SIZE_USD
+            and self.MIN_LEVERAGE <= leverage <= self.MAX_LEVERAGE
+            and liquidation_price > 0
+            and (distance_pct is None or 0.1 <= distance_pct <= 90)
+        ):
+            return _VALID_OK
+        
         errors = []
         warnings = []
         
@@ -144,22 +169,20 @@ class DataValidator:
         
         if size_usd > self.MAX_POSITION_SIZE_USD:
             errors.append(f"Position size ${size_usd:,.0f} exceeds realistic maximum")
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         # Leverage validation
         if leverage < self.MIN_LEVERAGE or leverage > self.MAX_LEVERAGE:
             errors.append(f"Invalid leverage {leverage}x (expected {self.MIN_LEVERAGE}-{self.MAX_LEVERAGE}x)")
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         # Liquidation price validation
         if liquidation_price <= 0:
             errors.append(f"Invalid liquidation price: {liquidation_price}")
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         # Check liquidation price relative to current
-        if current_price > 0:
-            distance_pct = abs(liquidation_price - current_price) / current_price * 100
-            
+        if distance_pct is not None:
             # Very close liquidations are suspicious (< 0.1%)
             if distance_pct < 0.1:
                 warnings.append(f"Liquidation very close to current price ({distance_pct:.2f}%)")
@@ -168,7 +191,9 @@ class DataValidator:
             if distance_pct > 90:
                 warnings.append(f"Liquidation very far from current price ({distance_pct:.1f}%)")
         
-        return ValidationResult(len(errors) == 0, warnings, errors)
+        if not errors and not warnings:
+            return _VALID_OK
+        return ValidationResult(len(errors) == 0, tuple(warnings), tuple(errors))
     
     def validate_liquidation_map(
         self,
@@ -182,7 +207,7 @@ class DataValidator:
         
         if not liq_map:
             warnings.append(f"{coin}: Empty liquidation map")
-            return ValidationResult(True, warnings, errors)
+            return ValidationResult(True, tuple(warnings), tuple(errors))
         
         # Validate structure
         required_keys = ["long_liquidations", "short_liquidations"]
@@ -191,31 +216,33 @@ class DataValidator:
                 errors.append(f"{coin}: Missing '{key}' in liquidation map")
         
         if errors:
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
+        
+        # Pull prices and sizes into flat lists once per side; sums and bounds
+        # then run in C, and the per-cluster scan only happens if a warning will fire
+        long_clusters = liq_map.get("long_liquidations", [])
+        long_prices = [cluster.get("price_center", 0) for cluster in long_clusters]
+        total_long_size = sum([cluster.get("total_size_usd", 0) for cluster in long_clusters])
+        
+        short_clusters = liq_map.get("short_liquidations", [])
+        short_prices = [cluster.get("price_center", 0) for cluster in short_clusters]
+        total_short_size = sum([cluster.get("total_size_usd", 0) for cluster in short_clusters])
         
         # Validate long liquidations (should be BELOW current price)
-        total_long_size = 0
-        for cluster in liq_map.get("long_liquidations", []):
-            price_level = cluster.get("price_center", 0)
-            size = cluster.get("total_size_usd", 0)
-            total_long_size += size
-            
-            if price_level > current_price:
-                warnings.append(
-                    f"{coin}: Long liquidation at ${price_level:,.2f} is ABOVE current ${current_price:,.2f}"
-                )
+        if long_prices and max(long_prices) > current_price:
+            for price_level in long_prices:
+                if price_level > current_price:
+                    warnings.append(
+                        f"{coin}: Long liquidation at ${price_level:,.2f} is ABOVE current ${current_price:,.2f}"
+                    )
         
         # Validate short liquidations (should be ABOVE current price)
-        total_short_size = 0
-        for cluster in liq_map.get("short_liquidations", []):
-            price_level = cluster.get("price_center", 0)
-            size = cluster.get("total_size_usd", 0)
-            total_short_size += size
-            
-            if price_level < current_price:
-                warnings.append(
-                    f"{coin}: Short liquidation at ${price_level:,.2f} is BELOW current ${current_price:,.2f}"
-                )
+        if short_prices and min(short_prices) < current_price:
+            for price_level in short_prices:
+                if price_level < current_price:
+                    warnings.append(
+                        f"{coin}: Short liquidation at ${price_level:,.2f} is BELOW current ${current_price:,.2f}"
+                    )
         
         # Check for extreme imbalance
         if total_long_size > 0 and total_short_size > 0:
@@ -225,7 +252,9 @@ class DataValidator:
                     f"{coin}: Extreme long/short imbalance ({ratio:.0f}x)"
                 )
         
-        return ValidationResult(len(errors) == 0, warnings, errors)
+        if not errors and not warnings:
+            return _VALID_OK
+        return ValidationResult(len(errors) == 0, tuple(warnings), tuple(errors))
     
     def validate_market_data(self, coin: str, data: Dict) -> ValidationResult:
         """Validate market data for a coin"""
@@ -239,7 +268,7 @@ class DataValidator:
                 errors.append(f"{coin}: Missing required field '{field}'")
         
         if errors:
-            return ValidationResult(False, warnings, errors)
+            return ValidationResult(False, tuple(warnings), tuple(errors))
         
         # Validate price
         price_result = self.validate_price(coin, data.get("mark_price", 0))
@@ -261,7 +290,9 @@ class DataValidator:
         if volume is not None and volume < 0:
             errors.append(f"{coin}: Invalid volume {volume}")
         
-        return ValidationResult(len(errors) == 0, warnings, errors)
+        if not errors and not warnings:
+            return _VALID_OK
+        return ValidationResult(len(errors) == 0, tuple(warnings), tuple(errors))
 
 
 # Global validator instance
@@ -283,10 +314,10 @@ def validate_and_log(
     result = validation_func(*args, **kwargs)
     
     for error in result.errors:
-        logger.error(f"Validation error: {error}")
+        logger.error("Validation error: %s", error)
     
-    if log_warnings:
+    if log_warnings and result.warnings and logger.isEnabledFor(logging.WARNING):
         for warning in result.warnings:
-            logger.warning(f"Validation warning: {warning}")
+            logger.warning("Validation warning: %s", warning)
     
     return result.is_valid
@@ -3,14 +3,19 @@ Wallet Discovery Module
 Discovers active trading wallets from trade stream and API queries
 """
 import asyncio
-import json
+import heapq
+import orjson
+import os
+import time
 import websockets
-from typing import Set, Dict, Callable, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict
-import aiohttp
+from typing import Set, Dict, Callable, KeysView, Optional, Tuple
+from datetime import datetime
 
 from .config import config
+from .hyperliquid_api import HyperliquidAPI
+
+# Present in every trades-channel frame; other frames (pongs, acks for other feeds) are skipped unparsed
+TRADES_MARKER = '"trades"'
 
 
 class WalletDiscovery:
@@ -22,22 +27,34 @@ class WalletDiscovery:
     """
     
     def __init__(self):
-        self.active_wallets: Set[str] = set()
-        self.wallet_last_seen: Dict[str, datetime] = {}
-        self.wallet_trade_count: Dict[str, int] = defaultdict(int)
+        # wallet -> [last_seen, trade_count]; last_seen is epoch seconds, converted to ISO only on save
+        self.wallets: Dict[str, list] = {}
         self._ws: Optional[websockets.WebSocketClientProtocol] = None
         self._running = False
-        self._callbacks: list[Callable] = []
+        # (callback, is_coroutine) in registration order, classified once in add_callback
+        self._callbacks: list[Tuple[Callable, bool]] = []
+        self._has_async_callbacks = False
+        self._file_mtime: Optional[float] = None  # mtime of the cache file we last loaded/saved
         
     def add_callback(self, callback: Callable[[str], None]):
-        """Add callback for new wallet discovery"""
-        self._callbacks.append(callback)
-        
+        """Add callback for new wallet discovery (callbacks run in registration order)"""
+        is_async = asyncio.iscoroutinefunction(callback)
+        self._callbacks.append((callback, is_async))
+        self._has_async_callbacks = self._has_async_callbacks or is_async
+    
+    def _notify_sync(self, wallet: str):
+        """Notify callbacks of new wallet, when none of them are coroutines"""
+        for callback, _ in self._callbacks:
+            try:
+                callback(wallet)
+            except Exception as e:
+                print(f"Callback error: {e}")
+    
     async def _notify_new_wallet(self, wallet: str):
         """Notify callbacks of new wallet"""
-        for callback in self._callbacks:
+        for callback, is_async in self._callbacks:
             try:
-                if asyncio.iscoroutinefunction(callback):
+                if is_async:
                     await callback(wallet)
                 else:
                     callback(wallet)
@@ -47,24 +64,50 @@ class WalletDiscovery:
     def add_wallet(self, wallet: str) -> bool:
         """Add a wallet to tracking, returns True if new"""
         wallet = wallet.lower()
-        is_new = wallet not in self.active_wallets
-        
-        self.active_wallets.add(wallet)
-        self.wallet_last_seen[wallet] = datetime.now()
-        self.wallet_trade_count[wallet] += 1
+        record = self.wallets.get(wallet)
+        if record is None:
+            self.wallets[wallet] = [time.time(), 1]
+            return True
         
-        return is_new
+        record[0] = time.time()
+        record[1] += 1
+        return False
+    
+    @property
+    def active_wallets(self) -> KeysView[str]:
+        """All tracked wallets (a live, set-like view)"""
+        return self.wallets.keys()
     
     async def discover_from_trades(self, trades: list) -> int:
         """Extract wallets from trade data"""
-        new_count = 0
-        for trade in trades:
-            users = trade.get("users", [])
-            for user in users:
-                if self.add_wallet(user):
-                    new_count += 1
-                    await self._notify_new_wallet(user)
-        return new_count
+        # Addresses normally arrive lowercase already; only copy the ones that aren't
+        users = [
+            user if user.islower() else user.lower()
+            for trade in trades for user in trade.get("users", ())
+        ]
+        if not users:
+            return 0
+        
+        # Same bookkeeping as add_wallet, with one timestamp per batch
+        new_wallets = []
+        now = time.time()
+        wallets = self.wallets
+        for user in users:
+            record = wallets.get(user)
+            if record is None:
+                wallets[user] = [now, 1]
+                new_wallets.append(user)
+            else:
+                record[0] = now
+                record[1] += 1
+        
+        if self._has_async_callbacks:
+            for wallet in new_wallets:
+                await self._notify_new_wallet(wallet)
+        elif self._callbacks:
+            for wallet in new_wallets:
+                self._notify_sync(wallet)
+        return len(new_wallets)
     
     async def backfill_from_recent_trades(self, coins: list[str] = None):
         """Backfill wallets from recent trades for each coin"""
@@ -73,59 +116,64 @@ class WalletDiscovery:
             
         print(f"[WalletDiscovery] Backfilling from {len(coins)} assets...")
         
-        async with aiohttp.ClientSession() as session:
-            for coin in coins:
-                try:
-                    async with session.post(
-                        f"{config.API_URL}/info",
-                        json={"type": "recentTrades", "coin": coin},
-                        headers={"Content-Type": "application/json"}
-                    ) as response:
-                        if response.status == 200:
-                            trades = await response.json()
-                            new_count = await self.discover_from_trades(trades)
-                            if new_count > 0:
-                                print(f"  {coin}: +{new_count} wallets")
-                        
-                        # Rate limiting
-                        await asyncio.sleep(0.1)
-                        
-                except Exception as e:
-                    print(f"  {coin}: Error - {e}")
+        # Coins are fetched concurrently, paced by the client's rate limiter
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
         
-        print(f"[WalletDiscovery] Total wallets: {len(self.active_wallets)}")
+        async with HyperliquidAPI() as api:
+            async def fetch_one(coin: str):
+                async with semaphore:
+                    try:
+                        trades = await api.get_recent_trades(coin)
+                        new_count = await self.discover_from_trades(trades)
+                        if new_count > 0:
+                            print(f"  {coin}: +{new_count} wallets")
+                    except Exception as e:
+                        print(f"  {coin}: Error - {e}")
+            
+            await asyncio.gather(*(fetch_one(c) for c in coins))
+        
+        print(f"[WalletDiscovery] Total wallets: {len(self.wallets)}")
     
     async def start_websocket_discovery(self):
         """Start WebSocket listener for real-time trade discovery"""
         self._running = True
         
+        # Serialized once and resent on every reconnect (as text frames)
+        subscribe_msgs = [
+            orjson.dumps({
+                "method": "subscribe",
+                "subscription": {"type": "trades", "coin": coin}
+            }).decode()
+            for coin in config.ASSETS
+        ]
+        
         while self._running:
             try:
-                async with websockets.connect(config.WS_URL) as ws:
+                # The trade feed is high-rate, so skip permessage-deflate and allow large bursts
+                async with websockets.connect(config.WS_URL, max_size=2**22, compression=None) as ws:
                     self._ws = ws
                     
                     # Subscribe to trades for tracked assets
-                    for coin in config.ASSETS:
-                        subscribe_msg = {
-                            "method": "subscribe",
-                            "subscription": {"type": "trades", "coin": coin}
-                        }
-                        await ws.send(json.dumps(subscribe_msg))
+                    for subscribe_msg in subscribe_msgs:
+                        await ws.send(subscribe_msg)
                     
-                    print(f"[WalletDiscovery] WebSocket connected, subscribed to {len(config.ASSETS)} assets")
+                    print(f"[WalletDiscovery] WebSocket connected, subscribed to {len(subscribe_msgs)} assets")
                     
                     async for message in ws:
+                        # Cheap substring check before parsing; the channel is still checked below
+                        if isinstance(message, str) and TRADES_MARKER not in message:
+                            continue
                         try:
-                            data = json.loads(message)
+                            data = orjson.loads(message)
                             
                             if data.get("channel") == "trades":
                                 trades = data.get("data", [])
                                 new_count = await self.discover_from_trades(trades)
                                 
-                                if new_count > 0 and len(self.active_wallets) % 100 == 0:
-                                    print(f"[WalletDiscovery] {len(self.active_wallets)} wallets tracked")
+                                if new_count > 0 and len(self.wallets) % 100 == 0:
+                                    print(f"[WalletDiscovery] {len(self.wallets)} wallets tracked")
                                     
-                        except json.JSONDecodeError:
+                        except orjson.JSONDecodeError:
                             continue
                             
             except Exception as e:
@@ -142,57 +190,94 @@ class WalletDiscovery:
     
     def get_wallets(self, min_trades: int = 1, max_age_hours: int = 24) -> Set[str]:
         """Get wallets filtered by activity"""
-        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        cutoff = time.time() - max_age_hours * 3600
         
         return {
-            wallet for wallet in self.active_wallets
-            if self.wallet_trade_count[wallet] >= min_trades
-            and self.wallet_last_seen.get(wallet, datetime.min) > cutoff
+            wallet for wallet, (last_seen, trade_count) in self.wallets.items()
+            if trade_count >= min_trades and last_seen > cutoff
         }
     
     def get_stats(self) -> Dict:
         """Get discovery statistics"""
+        now = time.time()
+        hour_cutoff = now - 3600
+        day_cutoff = now - 24 * 3600
+        
+        # Both windows counted in one pass (same filter as get_wallets with min_trades=1)
+        last_hour = last_24h = 0
+        for last_seen, trade_count in self.wallets.values():
+            if trade_count >= 1 and last_seen > day_cutoff:
+                last_24h += 1
+                if last_seen > hour_cutoff:
+                    last_hour += 1
+        
         return {
-            "total_wallets": len(self.active_wallets),
-            "wallets_last_hour": len(self.get_wallets(max_age_hours=1)),
-            "wallets_last_24h": len(self.get_wallets(max_age_hours=24)),
-            "top_traders": sorted(
-                self.wallet_trade_count.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:10]
+            "total_wallets": len(self.wallets),
+            "wallets_last_hour": last_hour,
+            "wallets_last_24h": last_24h,
+            "top_traders": heapq.nlargest(
+                10,
+                ((wallet, record[1]) for wallet, record in self.wallets.items()),
+                key=lambda x: x[1]
+            )
         }
     
     def save_to_file(self, filepath: str = None):
-        """Save wallet list to file"""
+        """Save wallet list to file (safe to run via asyncio.to_thread)"""
         filepath = filepath or config.WALLET_CACHE_FILE
+        # Snapshot first, so trades recorded on the event loop meanwhile can't resize the dict under us
+        items = list(self.wallets.items())
         data = {
-            "wallets": list(self.active_wallets),
-            "last_seen": {k: v.isoformat() for k, v in self.wallet_last_seen.items()},
-            "trade_counts": dict(self.wallet_trade_count),
+            "wallets": [k for k, _ in items],
+            "last_seen": {k: datetime.fromtimestamp(v[0]).isoformat() for k, v in items},
+            "trade_counts": {k: v[1] for k, v in items},
             "saved_at": datetime.now().isoformat()
         }
-        with open(filepath, "w") as f:
-            json.dump(data, f)
-        print(f"[WalletDiscovery] Saved {len(self.active_wallets)} wallets to {filepath}")
+        
+        # Write to a temp file and swap it in, so readers never see a partial file
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_path, filepath)
+        self._file_mtime = os.path.getmtime(filepath)
+        print(f"[WalletDiscovery] Saved {len(items)} wallets to {filepath}")
     
     def load_from_file(self, filepath: str = None):
         """Load wallet list from file"""
         filepath = filepath or config.WALLET_CACHE_FILE
         try:
-            with open(filepath, "r") as f:
-                data = json.load(f)
+            mtime = os.path.getmtime(filepath)
+            with open(filepath, "rb") as f:
+                data = orjson.loads(f.read())
             
-            self.active_wallets = set(data.get("wallets", []))
-            self.wallet_last_seen = {
-                k: datetime.fromisoformat(v) 
-                for k, v in data.get("last_seen", {}).items()
+            self._file_mtime = mtime
+            last_seen = data.get("last_seen", {})
+            trade_counts = data.get("trade_counts", {})
+            self.wallets = {
+                k: [
+                    datetime.fromisoformat(last_seen[k]).timestamp() if k in last_seen else 0.0,
+                    trade_counts.get(k, 0),
+                ]
+                for k in data.get("wallets", [])
             }
-            self.wallet_trade_count = defaultdict(int, data.get("trade_counts", {}))
             
-            print(f"[WalletDiscovery] Loaded {len(self.active_wallets)} wallets from {filepath}")
+            print(f"[WalletDiscovery] Loaded {len(self.wallets)} wallets from {filepath}")
             
         except FileNotFoundError:
             print(f"[WalletDiscovery] No cache file found at {filepath}")
         except Exception as e:
             print(f"[WalletDiscovery] Error loading cache: {e}")
+    
+    def reload_if_changed(self, filepath: str = None) -> bool:
+        """Reload the wallet list only if the file changed since we last loaded/saved it"""
+        filepath = filepath or config.WALLET_CACHE_FILE
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            return False
+        
+        if mtime == self._file_mtime:
+            return False
+        
+        self.load_from_file(filepath)
+        return True
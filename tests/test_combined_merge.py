@@ -0,0 +1,56 @@
+"""
+Tests for Cross-Exchange Merge Helpers
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.combined_merge import FUNDING_ANNUALIZED_PCT, build_combined, build_funding
+
+
+class TestCombinedMerge:
+    """Tests for the combined market data and funding views"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.hl = {
+            "BTC": {"funding_rate": 0.0001},
+            "ETH": {"funding_rate": 0.0003},
+            "HYPE": {"funding_rate": 0.0002},
+        }
+        self.apex = {
+            "BTC": {"ticker": {"funding_rate": 0.0002}},
+            "ETH": {"ticker": {"funding_rate": 0.0001}},
+            "DOGE": {"ticker": {"funding_rate": 0.0001}},
+        }
+    
+    def test_build_combined_order_and_sides(self):
+        """Hyperliquid coins come first, Apex-only coins are appended"""
+        combined = build_combined(self.hl, self.apex)
+        assert list(combined) == ["BTC", "ETH", "HYPE", "DOGE"]
+        assert combined["HYPE"]["apex"] is None
+        assert combined["DOGE"]["hyperliquid"] is None
+        assert combined["BTC"]["apex"] == self.apex["BTC"]
+    
+    def test_build_funding_sorted_by_spread(self):
+        """Only coins on both exchanges, largest absolute spread first"""
+        result = build_funding(self.hl, self.apex)
+        assert result["count"] == 2
+        assert [row["coin"] for row in result["comparisons"]] == ["ETH", "BTC"]
+        eth = result["comparisons"][0]
+        assert eth["spread"] == pytest.approx(0.02)
+        assert eth["hyperliquid_annualized"] == pytest.approx(0.0003 * FUNDING_ANNUALIZED_PCT)
+    
+    def test_build_funding_zero_apex_rate(self):
+        """A zero Apex rate has no spread and sorts last"""
+        self.apex["HYPE"] = {"ticker": {"funding_rate": 0}}
+        rows = build_funding(self.hl, self.apex)["comparisons"]
+        assert rows[-1]["coin"] == "HYPE"
+        assert rows[-1]["spread"] is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,209 @@
+"""
+Tests for Historical Storage Module
+"""
+import pytest
+import sys
+import os
+import base64
+import json
+import sqlite3
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.historical_storage import (
+    HistoricalStorage, compress_json, compress_json_bytes, decompress_json, store_current_snapshot,
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from migrate_compress import migrate_compress
+
+
+SAMPLE_MAP = {
+    "BTC": {
+        "current_price": 90000,
+        "total_long_at_risk_usd": 5_000_000,
+        "total_short_at_risk_usd": 3_000_000,
+        "long_liquidations": [{"price_center": 85000, "total_size_usd": 5_000_000}],
+        "short_liquidations": [{"price_center": 95000, "total_size_usd": 3_000_000}],
+        "nearest_long_cluster": {"price_center": 85000, "total_size_usd": 5_000_000},
+        "nearest_short_cluster": None,
+    }
+}
+
+
+class TestHistoricalStorage:
+    """Tests for HistoricalStorage class"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), "historical.db")
+        self.storage = HistoricalStorage(self.db_path)
+    
+    def teardown_method(self):
+        """Close the persistent connection"""
+        self.storage.close()
+    
+    def test_uses_wal_journal(self):
+        """Database should be switched to WAL mode on init"""
+        with sqlite3.connect(self.db_path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    def test_store_cycle_roundtrip(self):
+        """Snapshot and prices stored together should both be readable"""
+        self.storage.store_cycle(SAMPLE_MAP, {"BTC": 90000.0, "ETH": 0})
+        
+        stats = self.storage.get_stats()
+        assert stats["snapshot_count"] == 1
+        assert stats["price_count"] == 1  # Zero prices are skipped
+        
+        snap = self.storage.get_snapshots("BTC")[0]
+        assert snap["nearest_long_price"] == 85000
+        assert snap["nearest_short_price"] is None
+        assert snap["clusters_json"]["long"] == SAMPLE_MAP["BTC"]["long_liquidations"]
+    
+    def test_clusters_stored_as_blob(self):
+        """Compressed clusters should be stored as raw bytes, not base64 text"""
+        self.storage.store_cycle(SAMPLE_MAP, {})
+        with sqlite3.connect(self.db_path) as conn:
+            assert conn.execute("SELECT typeof(clusters_json) FROM snapshots").fetchone()[0] == "blob"
+    
+    def test_latest_maps(self):
+        """store_cycle should replace the single latest map row"""
+        assert self.storage.get_latest_maps_raw() is None
+        assert self.storage.get_latest_updated_at() is None
+        
+        self.storage.store_cycle({"ETH": {}}, {})
+        self.storage.store_cycle(SAMPLE_MAP, {})
+        
+        updated_at, raw = self.storage.get_latest_maps_raw()
+        assert updated_at == self.storage.get_latest_updated_at()
+        assert json.loads(raw) == SAMPLE_MAP
+    
+    def test_batched_flush(self):
+        """With flush_every=N, cycles are written together on the Nth store or a forced flush"""
+        storage = HistoricalStorage(self.db_path, flush_every=3, flush_interval=3600)
+        
+        storage.store_cycle(SAMPLE_MAP, {"BTC": 90000.0}, datetime(2026, 1, 1, 0, 0))
+        storage.store_cycle(SAMPLE_MAP, {"BTC": 90100.0}, datetime(2026, 1, 1, 0, 5))
+        assert storage.get_stats()["snapshot_count"] == 0
+        
+        storage.store_cycle(SAMPLE_MAP, {"BTC": 90200.0}, datetime(2026, 1, 1, 0, 10))
+        assert storage.get_stats()["snapshot_count"] == 3
+        
+        storage.store_cycle(SAMPLE_MAP, {"BTC": 90300.0}, datetime(2026, 1, 1, 0, 15))
+        assert storage.flush(force=True) == 1
+        assert storage.flush(force=True) == 0
+        assert storage.get_stats()["price_count"] == 4
+        storage.close()
+    
+    def test_snapshots_thin(self):
+        """Thin snapshots should carry the numeric columns but no clusters"""
+        self.storage.store_cycle(SAMPLE_MAP, {"BTC": 90000.0}, datetime(2026, 1, 1, 0, 0))
+        rows = self.storage.get_snapshots_thin("BTC", datetime(2026, 1, 1), datetime(2026, 1, 2))
+        assert len(rows) == 1
+        assert rows[0]["nearest_long_price"] == 85000
+        assert "clusters_json" not in rows[0]
+    
+    def test_export_to_csv(self):
+        """CSV export should write the header and one line per recent snapshot"""
+        self.storage.store_cycle(SAMPLE_MAP, {"BTC": 90000.0}, datetime.now(timezone.utc).replace(tzinfo=None))
+        out = os.path.join(os.path.dirname(self.db_path), "btc.csv")
+        self.storage.export_to_csv("BTC", out)
+        with open(out) as f:
+            lines = f.read().splitlines()
+        assert lines[0].startswith("timestamp,coin,current_price")
+        assert len(lines) == 2
+        assert ",BTC,90000" in lines[1]
+    
+    def test_store_current_snapshot(self):
+        """The convenience helper should snapshot the latest stored map, and refuse when there is none"""
+        assert not store_current_snapshot(self.db_path)
+        
+        self.storage.store_cycle(SAMPLE_MAP, {}, datetime(2026, 1, 1, 0, 0))
+        assert store_current_snapshot(self.db_path)
+        assert self.storage.get_stats()["snapshot_count"] == 2
+    
+    def test_shared_connection_across_threads(self):
+        """The persistent connection should be usable from worker threads (asyncio.to_thread)"""
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(
+                lambda minute: self.storage.store_cycle(SAMPLE_MAP, {"BTC": 90000.0}, datetime(2026, 1, 1, 0, minute)),
+                range(8),
+            ))
+        assert self.storage.get_stats()["snapshot_count"] == 8
+        assert len(self.storage.get_snapshots("BTC", datetime(2026, 1, 1), datetime(2026, 1, 2))) == 8
+
+
+class TestMigrateCompress:
+    """Tests for the clusters_json compression migration"""
+    
+    def setup_method(self):
+        """Create a database with one snapshot row whose clusters_json is replaced per test"""
+        self.db_path = os.path.join(tempfile.mkdtemp(), "historical.db")
+        storage = HistoricalStorage(self.db_path)
+        storage.store_cycle(SAMPLE_MAP, {}, datetime(2026, 1, 1, 0, 0))
+        storage.close()
+    
+    def _migrate_row(self, clusters_json: str) -> dict:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE snapshots SET clusters_json = ?", (clusters_json,))
+        migrate_compress(self.db_path, workers=1)
+        with sqlite3.connect(self.db_path) as conn:
+            stored = conn.execute("SELECT clusters_json FROM snapshots").fetchone()[0]
+        assert isinstance(stored, bytes)
+        return decompress_json(stored)
+    
+    def test_zlib_row_with_nan(self):
+        """Legacy zlib rows holding NaN (written by json.dumps) should still decode after migration"""
+        legacy = "ZLIB:" + base64.b64encode(zlib.compress(json.dumps({"long": [{"avg_leverage": float("nan")}], "short": []}).encode())).decode()
+        data = self._migrate_row(legacy)
+        assert data["short"] == []
+        assert data["long"][0]["avg_leverage"] != data["long"][0]["avg_leverage"]  # NaN
+    
+    def test_compact_plain_row_with_non_finite(self):
+        """Compact plain rows are compressed without re-parsing, non-finite floats must survive"""
+        compact = '{"long":[{"price_center":Infinity,"avg_leverage":NaN}],"short":[{"price_center":-Infinity}]}'
+        data = self._migrate_row(compact)
+        assert data["long"][0]["price_center"] == float("inf")
+        assert data["short"][0]["price_center"] == float("-inf")
+        assert data["long"][0]["avg_leverage"] != data["long"][0]["avg_leverage"]  # NaN
+    
+    def test_spaced_plain_row_is_minified(self):
+        """Rows with default json.dumps separators should roundtrip through the re-serialize branch"""
+        data = self._migrate_row(json.dumps({"long": [{"price_center": 1.5, "x": float("nan")}], "short": []}))
+        assert data["long"][0]["price_center"] == 1.5
+
+
+class TestCompression:
+    """Tests for clusters_json compression helpers"""
+    
+    def test_roundtrip(self):
+        """Compressed data should decompress to the original"""
+        data = {"long": [{"price_center": 1.5}], "short": []}
+        assert decompress_json(compress_json(data)) == data
+    
+    def test_compress_json_bytes(self):
+        """Pre-serialized JSON should roundtrip through the blob format"""
+        data = {"long": [{"coin": "ETH", "price_center": 3000.5}], "short": []}
+        raw = json.dumps(data, separators=(',', ':')).encode()
+        assert decompress_json(compress_json_bytes(raw)) == data
+    
+    def test_zlib_legacy(self):
+        """Rows compressed before the preset dictionary should still load"""
+        data = {"long": [{"price_center": 1.5}], "short": []}
+        legacy = "ZLIB:" + base64.b64encode(zlib.compress(json.dumps(data).encode())).decode()
+        assert decompress_json(legacy) == data
+    
+    def test_uncompressed_legacy(self):
+        """Plain JSON rows from before compression should still load"""
+        assert decompress_json('{"long": [], "short": []}') == {"long": [], "short": []}
+    
+    def test_none(self):
+        """Missing data should decode to an empty dict"""
+        assert decompress_json(None) == {}
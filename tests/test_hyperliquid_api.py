@@ -0,0 +1,81 @@
+"""
+Tests for Hyperliquid API Wrapper
+"""
+import pytest
+import sys
+import os
+import orjson
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.hyperliquid_api import HyperliquidAPI
+
+
+class TestUserPositions:
+    """Tests for clearinghouseState parsing"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.api = HyperliquidAPI()
+    
+    def respond_with(self, body: dict):
+        async def fake_request_raw(data):
+            return orjson.dumps(body)
+        self.api._request_raw = fake_request_raw
+    
+    @pytest.mark.asyncio
+    async def test_flat_wallet(self):
+        """A wallet without positions should short-circuit to an empty list"""
+        self.respond_with({"assetPositions": [], "marginSummary": {"accountValue": "1.0"}})
+        assert await self.api.get_user_positions("0xabc") == []
+    
+    @pytest.mark.asyncio
+    async def test_parses_positions(self):
+        """Open positions should be parsed, dust skipped"""
+        self.respond_with({"assetPositions": [
+            {"position": {"coin": "BTC", "szi": "-0.5", "entryPx": "90000", "liquidationPx": "99000",
+                          "leverage": {"value": 20}, "positionValue": "45000",
+                          "unrealizedPnl": "10", "marginUsed": "2250"}},
+            {"position": {"coin": "ETH", "szi": "0.00001", "positionValue": "0.03"}},
+        ]})
+        positions = await self.api.get_user_positions("0xabc")
+        assert len(positions) == 1
+        assert positions[0].side == "short"
+        assert positions[0].liquidation_price == 99000
+        assert positions[0].notional_value == 45000
+
+
+
+class TestAssetInfo:
+    """Tests for metaAndAssetCtxs parsing"""
+    
+    @pytest.mark.asyncio
+    async def test_skips_delisted_and_unpaired(self):
+        """Delisted assets and universe entries without a context should be dropped"""
+        api = HyperliquidAPI()
+        
+        async def fake_meta_and_ctxs():
+            universe = [
+                {"name": "BTC", "maxLeverage": 40, "szDecimals": 5},
+                {"name": "OLD", "isDelisted": True},
+                {"name": "ETH", "maxLeverage": 25, "szDecimals": 4},
+                {"name": "NEW"},
+            ]
+            contexts = [
+                {"markPx": "90000", "openInterest": "100", "funding": "0.0001"},
+                {"markPx": "1", "openInterest": "0", "funding": "0"},
+                {"markPx": "3000", "openInterest": "2000", "funding": "-0.0002"},
+            ]
+            return {"universe": universe}, contexts
+        api.get_meta_and_asset_ctxs = fake_meta_and_ctxs
+        
+        assets = await api.get_asset_info()
+        assert list(assets) == ["BTC", "ETH"]
+        assert assets["ETH"].max_leverage == 25
+        assert assets["ETH"].mark_price == 3000.0
+        assert assets["ETH"].funding_rate == -0.0002
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
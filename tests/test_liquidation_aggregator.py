@@ -0,0 +1,107 @@
+"""
+Tests for Liquidation Aggregator Module
+"""
+import pytest
+import sys
+import os
+import json
+import tempfile
+from dataclasses import asdict
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.liquidation_aggregator import LiquidationAggregator, LiquidationCluster
+from src.position_scanner import LiquidationLevel
+
+
+def cluster(price_low, size_usd, leverage=10.0):
+    return LiquidationCluster(
+        coin="BTC", side="long", price_low=price_low, price_high=price_low + 100,
+        price_center=price_low + 50, total_size_usd=size_usd, position_count=1, avg_leverage=leverage,
+    )
+
+
+def level(price, size_usd, side="long", leverage=10.0):
+    return LiquidationLevel(price=price, size_usd=size_usd, side=side, wallet="0xabc", coin="BTC", leverage=leverage)
+
+
+class TestLiquidationAggregator:
+    """Tests for LiquidationAggregator clustering"""
+    
+    def setup_method(self):
+        """Setup test fixtures"""
+        self.aggregator = LiquidationAggregator(bucket_percent=1.0, min_cluster_size=1_000_000)
+    
+    def test_bucket_totals(self):
+        """Levels in one bucket should sum sizes, count positions and size-weight leverage"""
+        clusters = self.aggregator._aggregate_to_clusters(
+            [level(95100, 30_000, leverage=10), level(95200, 10_000, leverage=50)], 100000, "long"
+        )
+        assert len(clusters) == 1
+        cluster = clusters[0]
+        assert cluster.total_size_usd == 40_000
+        assert cluster.position_count == 2
+        assert cluster.avg_leverage == pytest.approx(20.0)
+        assert cluster.price_low == pytest.approx(96000)
+        assert cluster.price_high == pytest.approx(97000)
+    
+    def test_tiny_buckets_dropped(self):
+        """Buckets under $10k should not become clusters"""
+        clusters = self.aggregator._aggregate_to_clusters([level(95100, 5_000)], 100000, "long")
+        assert clusters == []
+
+    
+    def test_merge_adjacent_small_clusters(self):
+        """Neighbouring clusters below the minimum merge, large ones stay separate"""
+        merged = self.aggregator._merge_adjacent_clusters([
+            cluster(90100, 200_000, leverage=20), cluster(90000, 200_000, leverage=10), cluster(90200, 5_000_000),
+        ])
+        assert len(merged) == 2
+        assert merged[0].price_low == 90000
+        assert merged[0].price_high == 90200
+        assert merged[0].total_size_usd == 400_000
+        assert merged[0].position_count == 2
+        assert merged[0].avg_leverage == pytest.approx(15.0)
+        assert merged[1].total_size_usd == 5_000_000
+
+    
+    def test_save_maps_matches_to_dict(self):
+        """Saved file should hold each map's to_dict() and leave no temp file behind"""
+        self.aggregator.build_maps_from_levels(
+            [level(95100, 30_000), level(104900, 20_000, side="short")], {"BTC": 100000}
+        )
+        path = os.path.join(tempfile.mkdtemp(), "liquidation_map.json")
+        self.aggregator.save_maps(path)
+        
+        with open(path) as f:
+            saved = json.load(f)
+        assert saved == {"BTC": self.aggregator.liquidation_maps["BTC"].to_dict()}
+        assert not os.path.exists(path + ".tmp")
+
+    
+    def test_trading_signals(self):
+        """Large clusters 0.5-3% away should signal toward them, biggest first"""
+        self.aggregator.build_maps_from_levels([
+            level(98500, 20_000_000, side="long"),
+            level(101500, 30_000_000, side="short"),
+        ], {"BTC": 100000})
+        
+        signals = self.aggregator.get_trading_signals({"BTC": 100000})
+        assert [s["signal"] for s in signals] == ["LONG", "SHORT"]
+        assert signals[0]["reason"].startswith("Short liquidation cluster $30.0M")
+        assert 0.5 <= signals[1]["distance_percent"] <= 3.0
+        
+        # Too far away once price moves
+        assert self.aggregator.get_trading_signals({"BTC": 90000}) == []
+
+    
+    def test_cluster_to_dict_matches_asdict(self):
+        """The hand-written to_dict should stay in sync with the dataclass fields"""
+        c = cluster(90000, 200_000)
+        assert c.to_dict() == asdict(c)
+        assert list(c.to_dict()) == list(asdict(c))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,52 @@
+"""
+Tests for Logging Configuration
+"""
+import pytest
+import sys
+import os
+import logging
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import logger as logger_module
+from src.logger import setup_logger, stop_loggers
+
+
+class TestSetupLogger:
+    """Tests for the queue-based logger setup"""
+    
+    def setup_method(self):
+        self.log_dir = tempfile.mkdtemp()
+    
+    def teardown_method(self):
+        stop_loggers()
+    
+    def test_import_starts_no_listener(self):
+        """Importing the module should not start a listener thread"""
+        assert "hl-collector-test" not in logger_module._listeners
+    
+    def test_records_reach_file_after_stop(self):
+        """Child logger records are written out once the listener is stopped"""
+        setup_logger("hl-collector-test", log_dir=self.log_dir)
+        logging.getLogger("hl-collector-test.child").info("saved maps")
+        stop_loggers()
+        
+        with open(os.path.join(self.log_dir, "hl-collector-test.log")) as f:
+            assert "hl-collector-test.child - INFO - saved maps" in f.read()
+    
+    def test_setup_after_stop(self):
+        """A stopped logger can be set up again with a fresh listener"""
+        setup_logger("hl-collector-test", log_dir=self.log_dir)
+        stop_loggers()
+        assert not logging.getLogger("hl-collector-test").handlers
+        
+        setup_logger("hl-collector-test", log_dir=self.log_dir)
+        assert "hl-collector-test" in logger_module._listeners
+
+
+# ============== Run Tests ==============
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,46 @@
+"""
+Tests for the Async Token-Bucket Rate Limiter
+"""
+import pytest
+import asyncio
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rate_limit import AsyncLimiter
+
+
+class TestAsyncLimiter:
+    """Tests for AsyncLimiter"""
+    
+    @pytest.mark.asyncio
+    async def test_burst_is_immediate(self):
+        """A full bucket should let max_rate requests through without waiting"""
+        limiter = AsyncLimiter(20, time_period=1.0)
+        start = time.monotonic()
+        for _ in range(20):
+            async with limiter:
+                pass
+        assert time.monotonic() - start < 0.05
+    
+    @pytest.mark.asyncio
+    async def test_waits_when_empty(self):
+        """Requests beyond the burst should be paced at the refill rate"""
+        limiter = AsyncLimiter(10, time_period=0.1)  # 100/s
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(15)))
+        elapsed = time.monotonic() - start
+        # 10 burst + 5 paced at 10ms each
+        assert 0.04 <= elapsed < 0.2
+    
+    def test_invalid_rate(self):
+        """Non-positive rates should be rejected"""
+        with pytest.raises(ValueError):
+            AsyncLimiter(0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
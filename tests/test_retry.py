@@ -78,6 +78,47 @@ class TestRetryAsync:
             await raises_value_error()
         
         assert call_count == 1  # Should not retry
+    
+    @pytest.mark.asyncio
+    async def test_honours_retry_after(self, monkeypatch):
+        """A RateLimitError's retry_after should replace the backoff delay"""
+        sleeps = []
+        
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        
+        call_count = 0
+        
+        @retry_async(max_attempts=2, initial_delay=0.01, exceptions=(RateLimitError,))
+        async def rate_limited():
+            nonlocal call_count
+            call_count += 1
+            if call_count == 1:
+                raise RateLimitError("Too many requests", retry_after=5.0)
+            return "success"
+        
+        assert await rate_limited() == "success"
+        assert sleeps == [5.0]
+    
+    @pytest.mark.asyncio
+    async def test_jittered_delay(self, monkeypatch):
+        """Backoff delays should be randomized to 50-150% of the schedule"""
+        sleeps = []
+        
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        
+        @retry_async(max_attempts=4, initial_delay=1.0, max_delay=3.0)
+        async def always_fails():
+            raise ConnectionError("Always fails")
+        
+        with pytest.raises(ConnectionError):
+            await always_fails()
+        
+        for sleep_for, base in zip(sleeps, [1.0, 2.0, 3.0]):
+            assert 0.5 * base <= sleep_for <= 1.5 * base
 
 
 class TestRetrySync:
@@ -127,6 +168,8 @@ class TestCustomExceptions:
         """RateLimitError should be retryable"""
         error = RateLimitError("Too many requests")
         assert isinstance(error, Exception)
+        assert error.retry_after is None
+        assert RateLimitError("Slow down", retry_after=2.5).retry_after == 2.5
 
 
 # ============== Run Tests ==============
@@ -174,6 +174,21 @@ class TestDataValidator:
         }
         result = self.validator.validate_liquidation_map("BTC", liq_map, 90000)
         assert result.is_valid
+        assert result.warnings == () and result.errors == ()
+    
+    def test_clean_results_are_shared(self):
+        """Clean validations should return the same immutable result object"""
+        clean = self.validator.validate_price("BTC", 90000)
+        assert clean is self.validator.validate_market_data("BTC", {"mark_price": 90000, "funding_rate": 0.0001})
+        assert not self.validator.validate_price("BTC", 0)
+        with pytest.raises(AttributeError):
+            clean.is_valid = False
+    
+    def test_messages_are_tuples(self):
+        """Clean and failing results should expose the same (immutable) message type"""
+        assert isinstance(self.validator.validate_price("BTC", 90000).errors, tuple)
+        failed = self.validator.validate_price("BTC", 0)
+        assert isinstance(failed.errors, tuple) and isinstance(failed.warnings, tuple)
     
     def test_validate_liq_map_missing_key(self):
         """Missing required key should fail"""
@@ -195,6 +210,24 @@ class TestDataValidator:
         result = self.validator.validate_liquidation_map("BTC", liq_map, 90000)
         assert result.is_valid  # Valid but warns
         assert len(result.warnings) > 0
+    
+    def test_validate_liq_map_short_below_price_and_imbalance(self):
+        """Only the misplaced short clusters should warn, plus the long/short imbalance"""
+        liq_map = {
+            "long_liquidations": [
+                {"price_center": 85000, "total_size_usd": 500_000_000}
+            ],
+            "short_liquidations": [
+                {"price_center": 95000, "total_size_usd": 1_000_000},
+                {"price_center": 88000, "total_size_usd": 1_000_000},  # Below current!
+            ]
+        }
+        result = self.validator.validate_liquidation_map("BTC", liq_map, 90000)
+        assert result.is_valid
+        assert result.warnings == (
+            "BTC: Short liquidation at $88,000.00 is BELOW current $90,000.00",
+            "BTC: Extreme long/short imbalance (250x)",
+        )
 
 
 # ============== Run Tests ==============
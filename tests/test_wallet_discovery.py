@@ -0,0 +1,163 @@
+"""
+Tests for Wallet Discovery cache file handling
+"""
+import pytest
+import sys
+import os
+import json
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.wallet_discovery import WalletDiscovery
+
+
+class TestReloadIfChanged:
+    """Tests for mtime-based wallet file reloading"""
+    
+    def setup_method(self):
+        self.filepath = os.path.join(tempfile.mkdtemp(), "wallets.json")
+        writer = WalletDiscovery()
+        writer.add_wallet("0xabc")
+        writer.save_to_file(self.filepath)
+    
+    def test_first_call_loads(self):
+        """A fresh instance should load the file"""
+        discovery = WalletDiscovery()
+        assert discovery.reload_if_changed(self.filepath)
+        assert discovery.active_wallets == {"0xabc"}
+    
+    def test_unchanged_file_not_reloaded(self):
+        """Second call without a file change should be a no-op"""
+        discovery = WalletDiscovery()
+        discovery.load_from_file(self.filepath)
+        assert not discovery.reload_if_changed(self.filepath)
+    
+    def test_changed_file_reloaded(self):
+        """A file rewritten by someone else should be picked up"""
+        discovery = WalletDiscovery()
+        discovery.load_from_file(self.filepath)
+        
+        writer = WalletDiscovery()
+        writer.add_wallet("0xdef")
+        writer.save_to_file(self.filepath)
+        os.utime(self.filepath, (0, 12345))
+        
+        assert discovery.reload_if_changed(self.filepath)
+        assert discovery.active_wallets == {"0xdef"}
+    
+    def test_missing_file(self):
+        """Missing file should not raise"""
+        discovery = WalletDiscovery()
+        assert not discovery.reload_if_changed(self.filepath + ".missing")
+
+
+
+class TestLastSeen:
+    """Tests for last-seen timestamps and activity filtering"""
+    
+    def test_get_wallets_filters_by_age(self):
+        """Wallets older than max_age_hours should be excluded"""
+        discovery = WalletDiscovery()
+        discovery.add_wallet("0xNEW")
+        discovery.add_wallet("0xold")
+        discovery.wallets["0xold"][0] -= 2 * 3600
+        
+        assert discovery.get_wallets(max_age_hours=1) == {"0xnew"}
+        assert discovery.get_wallets(max_age_hours=24) == {"0xnew", "0xold"}
+    
+    def test_get_stats(self):
+        """Window counts should match get_wallets and top traders are ordered by trade count"""
+        discovery = WalletDiscovery()
+        for wallet, trades in [("0xa", 1), ("0xb", 3), ("0xc", 2)]:
+            for _ in range(trades):
+                discovery.add_wallet(wallet)
+        discovery.wallets["0xc"][0] -= 2 * 3600
+        discovery.wallets["0xa"][0] -= 48 * 3600
+        
+        stats = discovery.get_stats()
+        assert stats["total_wallets"] == 3
+        assert stats["wallets_last_hour"] == len(discovery.get_wallets(max_age_hours=1)) == 1
+        assert stats["wallets_last_24h"] == len(discovery.get_wallets(max_age_hours=24)) == 2
+        assert stats["top_traders"] == [("0xb", 3), ("0xc", 2), ("0xa", 1)]
+    
+    def test_last_seen_roundtrip(self):
+        """Timestamps should survive the ISO format used in the cache file"""
+        filepath = os.path.join(tempfile.mkdtemp(), "wallets.json")
+        writer = WalletDiscovery()
+        writer.add_wallet("0xabc")
+        writer.save_to_file(filepath)
+        
+        with open(filepath) as f:
+            assert "T" in json.load(f)["last_seen"]["0xabc"]
+        
+        discovery = WalletDiscovery()
+        discovery.load_from_file(filepath)
+        assert discovery.wallets["0xabc"][0] == pytest.approx(writer.wallets["0xabc"][0], abs=1e-3)
+        assert discovery.get_wallets() == {"0xabc"}
+    
+    def test_load_missing_fields(self):
+        """Wallets without a saved timestamp or count should load as stale, not fail"""
+        filepath = os.path.join(tempfile.mkdtemp(), "wallets.json")
+        with open(filepath, "w") as f:
+            json.dump({"wallets": ["0xabc"]}, f)
+        
+        discovery = WalletDiscovery()
+        discovery.load_from_file(filepath)
+        assert discovery.active_wallets == {"0xabc"}
+        assert discovery.get_wallets(min_trades=0) == set()
+
+
+class TestDiscoverFromTrades:
+    """Tests for batch wallet extraction from trade messages"""
+    
+    @pytest.mark.asyncio
+    async def test_counts_and_callbacks(self):
+        """New wallets are counted and notified once; trade counts follow every appearance"""
+        discovery = WalletDiscovery()
+        discovery.add_wallet("0xold")
+        seen = []
+        discovery.add_callback(seen.append)
+        
+        trades = [
+            {"users": ["0xA", "0xold"]},
+            {"users": ["0xa", "0xB"]},
+            {},
+        ]
+        assert await discovery.discover_from_trades(trades) == 2
+        assert seen == ["0xa", "0xb"]
+        assert discovery.active_wallets == {"0xold", "0xa", "0xb"}
+        assert discovery.wallets["0xa"][1] == 2
+        assert discovery.wallets["0xold"][1] == 2
+    
+    @pytest.mark.asyncio
+    async def test_async_callbacks(self):
+        """Mixed callbacks run in registration order and a failing one doesn't stop the others"""
+        discovery = WalletDiscovery()
+        seen = []
+        
+        async def record(wallet):
+            seen.append(wallet)
+        
+        def broken(wallet):
+            raise ValueError("boom")
+        
+        discovery.add_callback(record)
+        discovery.add_callback(broken)
+        discovery.add_callback(lambda wallet: seen.append("sync:" + wallet))
+        assert await discovery.discover_from_trades([{"users": ["0xA"]}]) == 1
+        assert seen == ["0xa", "sync:0xa"]  # Registration order, async first here
+    
+    @pytest.mark.asyncio
+    async def test_empty_batch(self):
+        """Trades without users should be a no-op"""
+        discovery = WalletDiscovery()
+        assert await discovery.discover_from_trades([]) == 0
+        assert discovery.active_wallets == set()
+
+
+# ============== Run Tests ==============
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])